@@ -1,20 +1,31 @@
 # app/api/alert_routes.py
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 
 from app.database.db import get_db
 from app.database.twin_schema import Twin
 from app.utils.helpers import get_twin_or_404
 from app.core.tracker import get_current_status
-from app.core.alerts import get_alert_recommendation
+from app.core.alerts import get_alert_recommendation, alert_status_cache
 
 router = APIRouter()
 
 
 @router.get("/status/{user_id}")
 def get_alert_status(user_id: int, db: Session = get_db()):
-    twin = db.query(Twin).filter(Twin.user_id == user_id).first()
-    twin = get_twin_or_404(db, twin.id)
+    # only the row version is needed to answer a repeat poll from cache
+    row = db.query(Twin.id, Twin.updated_at).filter(Twin.user_id == user_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Twin not found")
+
+    key = (row.id, row.updated_at)
+    cached = alert_status_cache.get(key)
+    if cached is not None:
+        return cached
+
+    twin = get_twin_or_404(db, row.id)
     status = get_current_status(twin)
     alert = get_alert_recommendation(status)
-    return {"user_id": user_id, "status": status, "alert": alert}
+    result = {"user_id": user_id, "status": status, "alert": alert}
+    alert_status_cache.set(key, result)
+    return result
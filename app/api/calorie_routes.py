@@ -1,7 +1,9 @@
 # app/api/calorie_routes.py
-from typing import List, Dict
+import io
+from datetime import date
+from typing import List, Dict, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
 from pydantic import BaseModel
 
 from sqlalchemy.orm import Session
@@ -11,12 +13,23 @@ from app.nutrition.nutrition_service import (
     log_meal,
     get_daily_summary,
     get_meal_history,
+    HISTORY_PAGE_SIZE,
 )
+from app.nutrition.food_catalog import search_foods, load_catalog
+from app.nutrition.meal_import import import_meals
+from app.nutrition.meal_analytics import food_totals, backfill_meal_items
+from app.nutrition.nutrition_rollups import get_rollups, rebuild_rollups
 from app.nutrition.nutrition_mlops import (
     retrain_food_mlops,
     list_food_models,
     active_food_model,
 )
+from app.ml.training_jobs import (
+    JobConflictError,
+    submit_retrain_job,
+    get_job,
+    list_jobs,
+)
 
 router = APIRouter()
 
@@ -27,7 +40,7 @@ router = APIRouter()
 
 class MealItem(BaseModel):
     name: str       # e.g. "idli", "aloo_paratha"
-    quantity: float # in "units" as per FOOD_DB
+    quantity: float # in "units" as per the food catalog
 
 
 class MealLogCreate(BaseModel):
@@ -41,14 +54,16 @@ class MealLogRead(BaseModel):
     twin_id: int
     date: str
     meal_type: str
-    items: List[Dict[str, float]]
+    items: Optional[List[MealItem]] = None  # omitted with ?summary=true
     calories: float
     protein: float
     carbs: float
     fat: float
 
-    class Config:
-        orm_mode = True
+
+class MealHistoryPage(BaseModel):
+    meals: List[MealLogRead]
+    next_cursor: Optional[str] = None  # pass as ?cursor= for the next page
 
 
 class DailySummaryRead(BaseModel):
@@ -72,7 +87,7 @@ def log_breakfast(
     db: Session = get_db(),
 ):
     try:
-        meal, daily = log_meal(
+        meal, daily, resolved_items = log_meal(
             db=db,
             twin_id=payload.twin_id,
             meal_type=payload.meal_type,
@@ -94,6 +109,10 @@ def log_breakfast(
             "protein": meal.protein,
             "carbs": meal.carbs,
             "fat": meal.fat,
+            # how each item name was matched ("exact" / "fuzzy" / "unknown" / "unpriced")
+            "items": resolved_items,
+            # catalog foods without nutrient values, counted as zero
+            "unpriced_items": sum(1 for item in resolved_items if item["match"] == "unpriced"),
         },
         "daily_summary": {
             "twin_id": daily.twin_id,
@@ -105,6 +124,28 @@ def log_breakfast(
     }
 
 
+@router.post("/meals/import")
+def import_meal_history(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: Session = get_db(),
+):
+    """
+    Bulk import of meals for many twins and dates from an NDJSON or CSV
+    upload (columns: twin_id, date, meal_type, items). Rows are streamed
+    and inserted in chunks; failing rows are reported, not fatal.
+    """
+    fmt = format or ("csv" if (file.filename or "").endswith(".csv") else "ndjson")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        return import_meals(db, stream, fmt)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
 @router.get("/daily/{twin_id}", response_model=DailySummaryRead)
 def get_today_summary(
     twin_id: int,
@@ -127,46 +168,203 @@ def get_today_summary(
     )
 
 
-@router.get("/history/{twin_id}", response_model=List[MealLogRead])
+@router.get("/history/{twin_id}", response_model=MealHistoryPage)
 def list_meals(
     twin_id: int,
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    summary: bool = False,
+    db: Session = get_db(),
+):
+    """
+    Meals newest first, one page at a time. Follow `next_cursor` until it
+    is null; `from` / `to` bound the dates and `summary=true` leaves out
+    the item lists.
+    """
+    try:
+        meals, next_cursor = get_meal_history(
+            db,
+            twin_id,
+            limit=limit,
+            cursor=cursor,
+            date_from=date_from,
+            date_to=date_to,
+            include_items=not summary,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+    for m in meals:
+        m["date"] = str(m["date"])
+    return {"meals": meals, "next_cursor": next_cursor}
+
+
+@router.get("/trends/{twin_id}")
+def nutrition_trends(
+    twin_id: int,
+    period: str = "week",
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    db: Session = get_db(),
+):
+    """
+    Weekly or monthly totals, meal counts and average daily balance, read
+    from the rollup tables (default range: the last 52 weeks / 12 months).
+    """
+    try:
+        periods = get_rollups(db, twin_id, period=period, date_from=date_from, date_to=date_to)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return {"twin_id": twin_id, "period": period, "periods": periods}
+
+
+@router.post("/trends/rebuild")
+def rebuild_nutrition_trends(twin_id: Optional[int] = None, db: Session = get_db()):
+    """
+    Recompute the weekly / monthly rollups from the raw meal logs.
+    """
+    return rebuild_rollups(db, [twin_id] if twin_id is not None else None)
+
+
+# -----------------------------
+#  ROUTES – FOOD CATALOG
+# -----------------------------
+
+@router.get("/foods/search")
+def search_food_catalog(q: str, limit: int = 10):
+    """
+    Type-ahead search: foods whose name (or a later word of it) starts
+    with `q`, served from the in-memory catalog index.
+    """
+    return {"query": q, "results": search_foods(q, limit=min(limit, 50))}
+
+
+@router.post("/foods/import")
+def import_food_catalog(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+):
+    """
+    Bulk load foods from a CSV (header: name, calories, protein, carbs,
+    fat[, unit, display_name]) or JSONL upload; rows are upserted by name.
+    """
+    fmt = format or ("jsonl" if (file.filename or "").endswith((".jsonl", ".ndjson")) else "csv")
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        return load_catalog(stream, fmt)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+
+
+# -----------------------------
+#  ROUTES – MEAL ANALYTICS
+# -----------------------------
+
+@router.get("/analytics/foods")
+def top_foods(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    city: Optional[str] = None,
+    twin_id: Optional[int] = None,
+    metric: str = "calories",
+    limit: int = 10,
     db: Session = get_db(),
 ):
-    logs = get_meal_history(db, twin_id)
-    result: List[MealLogRead] = []
-    import json as _json
-
-    for m in logs:
-        try:
-            items = _json.loads(m.food_json)
-        except Exception:
-            items = []
-        result.append(
-            MealLogRead(
-                id=m.id,
-                twin_id=m.twin_id,
-                date=str(m.date),
-                meal_type=m.meal_type,
-                items=items,
-                calories=m.calories,
-                protein=m.protein,
-                carbs=m.carbs,
-                fat=m.fat,
-            )
+    """
+    Foods ranked by summed `metric` (calories, protein, carbs, fat or
+    quantity), e.g. top foods by calories in Delhi this month.
+    """
+    try:
+        foods = food_totals(
+            db, date_from=date_from, date_to=date_to, city=city,
+            twin_id=twin_id, metric=metric, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
         )
-    return result
+    return {"metric": metric, "foods": foods}
+
+
+@router.get("/analytics/twin-foods")
+def twin_food_totals(
+    date_from: Optional[date] = Query(None, alias="from"),
+    date_to: Optional[date] = Query(None, alias="to"),
+    city: Optional[str] = None,
+    food_id: Optional[int] = None,
+    metric: str = "protein",
+    limit: int = 100,
+    db: Session = get_db(),
+):
+    """
+    Summed nutrition per (twin, food), e.g. protein per food per twin.
+    """
+    try:
+        rows = food_totals(
+            db, date_from=date_from, date_to=date_to, city=city,
+            food_id=food_id, by_twin=True, metric=metric, limit=limit,
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e),
+        )
+    return {"metric": metric, "rows": rows}
+
+
+@router.post("/analytics/backfill")
+def backfill_analytics(db: Session = get_db()):
+    """
+    Write meal_items for meals logged before per-food analytics existed.
+    """
+    return backfill_meal_items(db)
 
 
 # -----------------------------
 #  ROUTES – FOOD MLOPS
 # -----------------------------
 
-@router.post("/mlops/retrain")
+@router.post("/mlops/retrain", status_code=status.HTTP_202_ACCEPTED)
 def retrain_food():
     """
-    Retrain the food calorie model (separate from health alert model).
+    Retrain the food calorie model (separate from health alert model)
+    as a background job. Poll /mlops/jobs/{job_id} for the result.
     """
-    return retrain_food_mlops()
+    try:
+        return submit_retrain_job("food", retrain_food_mlops)
+    except JobConflictError as e:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=str(e),
+        )
+
+
+@router.get("/mlops/jobs")
+def list_food_retrain_jobs(limit: int = 20):
+    return {"jobs": list_jobs("food", limit=limit)}
+
+
+@router.get("/mlops/jobs/{job_id}")
+def food_retrain_job_status(job_id: str):
+    job = get_job(job_id)
+    if not job or job["family"] != "food":
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found",
+        )
+    return job
 
 
 @router.get("/mlops/models")
@@ -1,4 +1,10 @@
+import json
+from itertools import islice
+from typing import Iterator, List, Optional
+
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
 from sqlalchemy.orm import Session
 
 from app.database.db import get_db
@@ -8,21 +14,101 @@ from app.ml.model_manager import (
     get_registered_models,
     get_active_model_path,
     get_active_model_info,
+    active_model_load_stats,
     predict_alert_for_twin,
+    predict_alerts_for_twins,
+    refresh_feature_store,
+    prediction_cache_stats,
+)
+from app.core.alerts import alert_status_cache
+from app.nutrition.nutrition_service import required_calories_stats
+from app.ml.hparam_search import search_alert_model
+from app.ml.retention import RETENTION_KEEP, collect_garbage, collect_all
+from app.ml.shadow import (
+    shadow_scorer,
+    shadow_summary,
+    set_shadow_candidate,
+    clear_shadow_candidate,
+)
+from app.ml.training_jobs import (
+    JobConflictError,
+    submit_retrain_job,
+    get_job,
+    list_jobs,
 )
 
 router = APIRouter()
 
 
-@router.post("/retrain")
-def retrain():
+class CohortPredictRequest(BaseModel):
+    user_ids: Optional[List[int]] = None
+    city: Optional[str] = None
+    min_age: Optional[int] = None
+    max_age: Optional[int] = None
+    with_proba: bool = False
+
+
+class ShadowCandidateRequest(BaseModel):
+    model_id: Optional[int] = None    # a registered alert model (see /models)
+    model_path: Optional[str] = None  # or the artifact path of one
+
+
+def _ndjson_chunks(rows: Iterator[dict], lines_per_chunk: int = 1000) -> Iterator[str]:
+    # one write per block of lines instead of one per twin
+    while True:
+        block = list(islice(rows, lines_per_chunk))
+        if not block:
+            return
+        yield "".join(json.dumps(r) + "\n" for r in block)
+
+
+@router.post("/retrain", status_code=202)
+def retrain(parallel: bool = False, workers: Optional[int] = None):
     """
-    Full MLOps retraining on REAL Twin DB:
-    - multi-model
+    Full MLOps retraining on REAL Twin DB, run as a background job:
+    - multi-model (optionally fitted in parallel worker processes)
     - MLflow tracked
     - best model auto-promoted
+    Poll /jobs/{job_id} for progress and the final result.
+    """
+    try:
+        return submit_retrain_job(
+            "alert", retrain_alert_model, parallel=parallel, max_workers=workers
+        )
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.post("/search", status_code=202)
+def search(budget_seconds: float = 600.0, configs_per_family: int = 6, eta: int = 3):
+    """
+    Time-budgeted hyperparameter search (successive halving) over every
+    candidate family, run as a background job; the winner is promoted.
+    budget_seconds covers the search and the winner's final refit.
     """
-    return retrain_alert_model()
+    try:
+        return submit_retrain_job(
+            "alert",
+            search_alert_model,
+            budget_seconds=budget_seconds,
+            configs_per_family=configs_per_family,
+            eta=eta,
+        )
+    except JobConflictError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/jobs")
+def retrain_jobs(limit: int = 20):
+    return {"jobs": list_jobs("alert", limit=limit)}
+
+
+@router.get("/jobs/{job_id}")
+def retrain_job_status(job_id: str):
+    job = get_job(job_id)
+    if not job or job["family"] != "alert":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 @router.get("/models")
@@ -33,11 +119,47 @@ def list_models():
 @router.get("/model-status")
 def model_status():
     active = get_active_model_info()
-    return {"active_model": active}
+    return {"active_model": active, "loaded": active_model_load_stats()}
+
+
+@router.post("/gc")
+def garbage_collect(
+    family: Optional[str] = None,
+    keep: int = RETENTION_KEEP,
+    compress: bool = False,
+    dry_run: bool = False,
+):
+    """
+    Prune model artifacts: keep the active model plus the last `keep`
+    winners per family (optionally recompressed) and delete the rest.
+    Reports reclaimed bytes; the active model is never deleted.
+    """
+    try:
+        if family:
+            report = collect_garbage(family, keep=keep, compress=compress, dry_run=dry_run)
+            return {"reports": [report], "reclaimed_bytes": report["reclaimed_bytes"]}
+        return collect_all(keep=keep, compress=compress, dry_run=dry_run)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/feature-store/refresh")
+def feature_store_refresh():
+    """Recompute stored training features for new / changed twins only."""
+    return refresh_feature_store()
+
+
+@router.get("/cache-stats")
+def cache_stats():
+    return {
+        "alert_predictions": prediction_cache_stats(),
+        "alert_status": alert_status_cache.stats(),
+        "required_calories": required_calories_stats(),
+    }
 
 
 @router.get("/predict-alert/{user_id}")
-def predict_alert(user_id: int, db: Session = Depends(get_db)):
+def predict_alert(user_id: int, db: Session = get_db()):
     twin = db.query(Twin).filter(Twin.user_id == user_id).first()
     if not twin:
         raise HTTPException(status_code=404, detail="Twin not found")
@@ -61,3 +183,50 @@ def predict_alert(user_id: int, db: Session = Depends(get_db)):
         },
         "alert_prediction": result,
     }
+
+
+@router.post("/predict-alerts")
+def predict_alerts(payload: CohortPredictRequest):
+    """
+    Batch alert prediction for a cohort (user IDs and/or city / age band).
+    Streams one JSON object per twin (NDJSON).
+    """
+    try:
+        rows = predict_alerts_for_twins(
+            user_ids=payload.user_ids,
+            city=payload.city,
+            min_age=payload.min_age,
+            max_age=payload.max_age,
+            with_proba=payload.with_proba,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    return StreamingResponse(_ndjson_chunks(rows), media_type="application/x-ndjson")
+
+
+@router.post("/shadow")
+def start_shadow(payload: ShadowCandidateRequest):
+    """
+    Shadow-score a registered alert model on live predict-alert traffic,
+    off the response path. Unregistered artifacts are rejected.
+    """
+    try:
+        config = set_shadow_candidate(payload.model_id, payload.model_path)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    shadow_scorer.start()
+    return {"shadow": config}
+
+
+@router.delete("/shadow")
+def stop_shadow():
+    clear_shadow_candidate()
+    return {"shadow": None}
+
+
+@router.get("/shadow")
+def get_shadow_summary():
+    """Label agreement and latency of the shadow candidate, across all workers."""
+    shadow_scorer.start()
+    return shadow_summary()
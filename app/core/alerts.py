@@ -1,6 +1,11 @@
 # app/core/alerts.py
 from typing import Dict
 from app.ml.alert_classifier import classify_alert_level
+from app.utils.cache import TTLCache
+
+# (twin_id, twin.updated_at) -> /api/alerts/status payload; a twin update
+# changes updated_at, so stale entries are never hit again
+alert_status_cache = TTLCache(maxsize=50000, ttl=3600.0)
 
 def get_alert_recommendation(status: Dict[str, str]) -> Dict[str, str]:
     """
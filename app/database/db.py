@@ -1,5 +1,6 @@
 import os
-from sqlalchemy import create_engine
+from contextlib import contextmanager
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 # ✅ FORCE ONE SINGLE DATABASE FILE: app.db (ABSOLUTE PATH)
@@ -16,6 +17,43 @@ engine = create_engine(
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+
+@contextmanager
+def schema_lock():
+    """
+    A transaction that holds SQLite's write lock from its first statement
+    (BEGIN IMMEDIATE), so schema changes made by several workers starting
+    at once are serialized: the later ones wait, then read the schema the
+    first one left behind.
+    """
+    with engine.begin() as conn:
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+        yield conn
+
+
+def sync_schema(tables, conn=None):
+    """
+    create_all() never alters existing tables: add any column or index
+    that a model declares but the existing app.db table is missing.
+    The columns are read inside the locked transaction (see schema_lock),
+    or inside the caller's `conn` when it already holds the lock.
+    """
+    if conn is None:
+        with schema_lock() as conn:
+            return sync_schema(tables, conn)
+
+    insp = inspect(conn)
+    for table in tables:
+        if not insp.has_table(table.name):
+            continue
+        existing = {c["name"] for c in insp.get_columns(table.name)}
+        for col in table.columns:
+            if col.name not in existing:
+                col_type = col.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {col.name} {col_type}"))
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+
 # ✅ Dependency for FastAPI routes
 def get_db():
     from fastapi import Depends
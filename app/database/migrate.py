@@ -0,0 +1,50 @@
+# app/database/migrate.py
+"""
+Bring app.db up to the current models: create missing tables, merge the
+duplicate daily summaries that would block their unique index, then add
+missing columns and indexes (sync_schema). Everything runs in one
+transaction holding SQLite's write lock, so concurrent runs serialize
+and the later ones find nothing left to do.
+
+app.main still runs it on import so existing databases keep upgrading
+in place, but a deployment starting several workers should run it once
+beforehand:
+
+    python -m app.database.migrate
+"""
+
+import json
+import argparse
+from typing import Dict, List, Optional
+
+from sqlalchemy import inspect
+
+from app.database.db import Base, engine, schema_lock, sync_schema
+# every model module, so Base.metadata knows all tables
+from app.database import mlops_schema, simulation_schema, twin_schema, user_schema  # noqa: F401
+from app.nutrition import nutrition_models  # noqa: F401
+from app.nutrition.nutrition_service import merge_duplicate_daily_summaries
+
+
+def migrate_schema() -> Dict:
+    with schema_lock() as conn:
+        existing = set(inspect(conn).get_table_names())
+        Base.metadata.create_all(bind=conn)
+        # duplicate daily summaries would block their new unique index
+        merged = merge_duplicate_daily_summaries(conn)
+        sync_schema(Base.metadata.sorted_tables, conn)
+    return {
+        "database": engine.url.database,
+        "tables_created": sorted(t.name for t in Base.metadata.sorted_tables if t.name not in existing),
+        "duplicate_summaries_merged": merged,
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Create / upgrade the app.db schema.")
+    parser.parse_args(argv)
+    print(json.dumps(migrate_schema(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
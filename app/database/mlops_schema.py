@@ -0,0 +1,64 @@
+# app/database/mlops_schema.py
+from sqlalchemy import (
+    Column, Integer, String, Boolean, DateTime, LargeBinary, JSON, Index,
+    ForeignKey, text,
+)
+
+from app.database.db import Base
+
+
+class RegisteredModel(Base):
+    __tablename__ = "model_registry"
+
+    id = Column(Integer, primary_key=True, index=True)
+    family = Column(String, nullable=False)  # "alert" / "food"
+
+    name = Column(String, nullable=False)
+    path = Column(String, nullable=False)
+    model_type = Column(String, nullable=True)
+    compiled_path = Column(String, nullable=True)
+    mlflow_run_id = Column(String, nullable=True)
+
+    # metrics and any other per-family fields (accuracy, f1_macro, mae...)
+    info = Column(JSON, nullable=True)
+
+    created_at = Column(String, nullable=False)
+    active = Column(Boolean, nullable=False, default=False)
+
+    # retention (see app/ml/retention.py): artifact files deleted / recompressed
+    pruned_at = Column(String, nullable=True)
+    compressed = Column(Boolean, nullable=True, default=False)
+
+    __table_args__ = (
+        Index("ix_model_registry_family_id", "family", "id"),
+        # at most one active model per family, and an O(1) way to find it
+        Index(
+            "ux_model_registry_active_family",
+            "family",
+            unique=True,
+            sqlite_where=text("active = 1"),
+        ),
+    )
+
+
+class ModelRegistryVersion(Base):
+    """Bumped on every registry change so readers can cheaply detect them."""
+
+    __tablename__ = "model_registry_versions"
+
+    family = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+
+class TwinFeatureRow(Base):
+    """Persisted alert-model feature vector per twin (see model_manager)."""
+
+    __tablename__ = "twin_features"
+
+    twin_id = Column(Integer, ForeignKey("twins.id"), primary_key=True)
+    features = Column(LargeBinary, nullable=False)  # float64 bytes, N_FEATURES wide
+    label = Column(Integer, nullable=False)
+
+    # Twin.updated_at the row was computed from
+    source_updated_at = Column(DateTime, nullable=True)
+    computed_at = Column(DateTime, nullable=False)
@@ -1,5 +1,6 @@
 # app/database/twin_schema.py
-from sqlalchemy import Column, Integer, Float, String, ForeignKey
+from datetime import datetime
+from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
 from sqlalchemy.orm import relationship
 from pydantic import BaseModel
 from typing import Optional
@@ -53,8 +54,12 @@ class Twin(Base):
     metabolic_score = Column(Float, nullable=True)
     mental_stress_score = Column(Float, nullable=True)
     organ_load_score = Column(Float, nullable=True)
-    
-    
+
+    # row version for incremental consumers (e.g. the ML feature store)
+    updated_at = Column(
+        DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, index=True
+    )
+
 
     user = relationship("User")
 
@@ -13,11 +13,16 @@ from app.api.calorie_routes import router as calorie_router
 
 # ✅ IMPORTANT: force nutrition tables to register with SQLAlchemy
 from app.nutrition import nutrition_models  # <---- THIS LINE IS REQUIRED
+from app.database import mlops_schema  # model registry tables
 
-from app.database.db import Base, engine
+from app.database.migrate import migrate_schema
+from app.ml.model_manager import get_active_model
+from app.nutrition.food_ml_model import warm_food_model
+from app.ml.training_jobs import recover_interrupted_jobs
 
-# ✅ Now ALL tables will be created correctly in app.db
-Base.metadata.create_all(bind=engine)
+# ✅ Now ALL tables (and columns / indexes added later) reach app.db;
+# serialized across workers, see app/database/migrate.py
+migrate_schema()
 
 app = FastAPI(
     title="BodyTwin Backend",
@@ -43,6 +48,20 @@ app.include_router(nutrition_router, prefix="/api/nutrition", tags=["Nutrition"]
 app.include_router(mlops_router, prefix="/api/mlops", tags=["MLOps"])
 app.include_router(calorie_router, prefix="/api/calories", tags=["Calories"])
 
+@app.on_event("startup")
+def preload_models():
+    # jobs of a worker that died mid-retrain would show as running forever
+    recover_interrupted_jobs()
+    # load the active models before the first request, in every worker;
+    # without a food model yet, its training starts in the background
+    for warm in (get_active_model, warm_food_model):
+        try:
+            warm()
+        except Exception:
+            # a broken artifact must not keep the API down; requests will report it
+            pass
+
+
 @app.get("/")
 def root():
     return {"message": "BodyTwin Backend is running"}
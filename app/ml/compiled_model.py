@@ -0,0 +1,258 @@
+# app/ml/compiled_model.py
+"""
+Compiled, dependency-light inference format for promoted alert models.
+
+A fitted Pipeline(StandardScaler, clf) is flattened into plain NumPy arrays:
+- logreg: coefficient matrix + intercept with the scaler folded in
+- rf / extra_trees / gb: every tree's nodes concatenated into flat arrays,
+  evaluated for all trees at once (one NumPy step per tree level)
+
+The evaluator only needs NumPy and gives the same labels as the pipeline
+without sklearn's per-call validation and estimator dispatch.
+Unsupported estimators (knn, adaboost, xgboost) are simply not compiled.
+
+The arrays are stored as an uncompressed joblib dict and loaded with
+mmap_mode="r", so every uvicorn worker maps the same read-only pages from
+the OS page cache instead of holding its own copy. (sklearn's own tree
+pickles copy their node arrays on load, so only this format is shared.)
+Files are written once under a new name and never modified in place.
+"""
+
+import os
+from typing import Dict, Optional
+
+import numpy as np
+from joblib import dump, load
+
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import (
+    RandomForestClassifier,
+    ExtraTreesClassifier,
+    GradientBoostingClassifier,
+)
+from sklearn.dummy import DummyClassifier
+
+COMPILED_SUFFIX = ".compiled.joblib"
+# earlier exports (np.savez); still loadable, but not memory-mapped
+LEGACY_COMPILED_SUFFIX = ".compiled.npz"
+
+
+# -----------------------------
+#  EXPORT
+# -----------------------------
+
+def _scaler_arrays(scaler: StandardScaler, n_features: int):
+    mean = scaler.mean_ if scaler.mean_ is not None else np.zeros(n_features)
+    scale = scaler.scale_ if scaler.scale_ is not None else np.ones(n_features)
+    return np.asarray(mean, dtype=float), np.asarray(scale, dtype=float)
+
+
+def _flatten_trees(trees, normalize: bool) -> Dict[str, np.ndarray]:
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+
+    for tree in trees:
+        t = tree.tree_
+        n = t.node_count
+        is_leaf = t.children_left == -1
+
+        feature = np.where(is_leaf, 0, t.feature).astype(np.int32)
+        # leaves point at themselves and always "go left"
+        threshold = np.where(is_leaf, np.inf, t.threshold)
+        own = np.arange(offset, offset + n, dtype=np.int32)
+        left = np.where(is_leaf, own, t.children_left + offset).astype(np.int32)
+        right = np.where(is_leaf, own, t.children_right + offset).astype(np.int32)
+
+        value = t.value[:, 0, :].astype(float)
+        if normalize:
+            norm = value.sum(axis=1, keepdims=True)
+            norm[norm == 0.0] = 1.0
+            value = value / norm
+
+        features.append(feature)
+        thresholds.append(threshold)
+        lefts.append(left)
+        rights.append(right)
+        values.append(value)
+        roots.append(offset)
+
+        offset += n
+        max_depth = max(max_depth, t.max_depth)
+
+    return {
+        "feature": np.concatenate(features),
+        "threshold": np.concatenate(thresholds),
+        "left": np.concatenate(lefts),
+        "right": np.concatenate(rights),
+        "value": np.concatenate(values),
+        "roots": np.asarray(roots, dtype=np.int32),
+        "max_depth": np.asarray(max_depth),
+    }
+
+
+def compile_pipeline(pipe) -> Optional[Dict[str, np.ndarray]]:
+    """Flatten a fitted scaler+classifier pipeline, or None if unsupported."""
+    if not isinstance(pipe, Pipeline) or len(pipe.steps) != 2:
+        return None
+
+    scaler, clf = pipe.steps[0][1], pipe.steps[1][1]
+    if not isinstance(scaler, StandardScaler):
+        return None
+
+    n_features = clf.n_features_in_
+    mean, scale = _scaler_arrays(scaler, n_features)
+    arrays = {"classes": np.asarray(clf.classes_)}
+
+    if isinstance(clf, LogisticRegression):
+        coef = clf.coef_ / scale
+        arrays.update({
+            "kind": np.asarray("linear"),
+            "coef": coef,
+            "intercept": clf.intercept_ - coef @ mean,
+        })
+        return arrays
+
+    arrays.update({"mean": mean, "scale": scale})
+
+    if isinstance(clf, (RandomForestClassifier, ExtraTreesClassifier)):
+        arrays.update(_flatten_trees(clf.estimators_, normalize=True))
+        arrays["kind"] = np.asarray("forest")
+        return arrays
+
+    if isinstance(clf, GradientBoostingClassifier):
+        if not (clf.init_ == "zero" or isinstance(clf.init_, DummyClassifier)):
+            return None
+        n_stages, n_outputs = clf.estimators_.shape
+        # stage-major order: tree (stage, k) sits at index stage * n_outputs + k
+        arrays.update(_flatten_trees(clf.estimators_.ravel(), normalize=False))
+        arrays["value"] = arrays["value"][:, 0]
+        arrays.update({
+            "kind": np.asarray("boosting"),
+            "n_outputs": np.asarray(n_outputs),
+            "learning_rate": np.asarray(clf.learning_rate),
+            # prior-based init is the same for every row
+            "init_raw": clf._raw_predict_init(
+                np.zeros((1, n_features), dtype=np.float32)
+            )[0].astype(float),
+        })
+        return arrays
+
+    return None
+
+
+def save_compiled(arrays: Dict[str, np.ndarray], path: str):
+    # uncompressed, so the arrays can be memory-mapped; written atomically
+    # because other workers may map the path as soon as it is registered
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    # (np.ascontiguousarray would turn the 0-d scalars into 1-d arrays)
+    arrays = {
+        k: v if v.flags.c_contiguous else np.ascontiguousarray(v)
+        for k, v in arrays.items()
+    }
+    dump(arrays, tmp_path)
+    os.replace(tmp_path, path)
+
+
+def export_compiled(pipe, model_path: str) -> Optional[str]:
+    """Compile `pipe` next to its joblib file; returns the path or None."""
+    arrays = compile_pipeline(pipe)
+    if arrays is None:
+        return None
+
+    path = model_path.rsplit(".joblib", 1)[0] + COMPILED_SUFFIX
+    save_compiled(arrays, path)
+    return path
+
+
+# -----------------------------
+#  EVALUATOR
+# -----------------------------
+
+class CompiledModel:
+    """Minimal predict / predict_proba over the exported arrays."""
+
+    def __init__(self, arrays: Dict[str, np.ndarray]):
+        self.kind = str(arrays["kind"][()])
+        self.classes_ = np.asarray(arrays["classes"])
+        self._a = {k: arrays[k] for k in arrays}
+        if self.kind != "linear":
+            self._max_depth = int(self._a["max_depth"])
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> "CompiledModel":
+        if path.endswith(LEGACY_COMPILED_SUFFIX):
+            with np.load(path, allow_pickle=False) as data:
+                return cls({k: data[k] for k in data.files})
+        return cls(load(path, mmap_mode="r" if mmap else None))
+
+    @property
+    def nbytes(self) -> int:
+        return int(sum(a.nbytes for a in self._a.values()))
+
+    @property
+    def mmapped(self) -> bool:
+        return any(isinstance(a, np.memmap) for a in self._a.values())
+
+    # ---- trees ----
+
+    def _leaves(self, X: np.ndarray) -> np.ndarray:
+        a = self._a
+        # same float32 cast sklearn applies before walking its trees
+        Xs = ((X - a["mean"]) / a["scale"]).astype(np.float32)
+        rows = np.arange(Xs.shape[0])[:, None]
+        node = np.broadcast_to(a["roots"], (Xs.shape[0], len(a["roots"])))
+
+        for _ in range(self._max_depth):
+            go_left = Xs[rows, a["feature"][node]] <= a["threshold"][node]
+            node = np.where(go_left, a["left"][node], a["right"][node])
+
+        return node  # (n_rows, n_trees) leaf indices
+
+    def _forest_proba(self, X: np.ndarray) -> np.ndarray:
+        leaf_values = self._a["value"][self._leaves(X).T]  # (n_trees, n_rows, n_classes)
+        return leaf_values.sum(axis=0) / len(self._a["roots"])
+
+    def _boosting_raw(self, X: np.ndarray) -> np.ndarray:
+        a = self._a
+        k = int(a["n_outputs"])
+        leaf_values = a["value"][self._leaves(X)]  # (n_rows, n_stages * k)
+        staged = a["learning_rate"] * leaf_values.reshape(len(X), -1, k).transpose(1, 0, 2)
+        init = np.broadcast_to(a["init_raw"], (1, len(X), k))
+        # accumulate stage by stage, like sklearn
+        return np.concatenate([init, staged]).sum(axis=0)
+
+    # ---- public ----
+
+    def decision_function(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        if self.kind == "linear":
+            return X @ self._a["coef"].T + self._a["intercept"]
+        if self.kind == "boosting":
+            return self._boosting_raw(X)
+        raise AttributeError("forest models have no decision_function")
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        if self.kind == "forest":
+            return self.classes_[np.argmax(self._forest_proba(X), axis=1)]
+
+        raw = self.decision_function(X)
+        if raw.shape[1] == 1:
+            return self.classes_[(raw[:, 0] > 0).astype(int)]
+        return self.classes_[np.argmax(raw, axis=1)]
+
+    def predict_proba(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=float)
+        if self.kind == "forest":
+            return self._forest_proba(X)
+
+        raw = self.decision_function(X)
+        if raw.shape[1] == 1:
+            p = 1.0 / (1.0 + np.exp(-raw[:, 0]))
+            return np.column_stack([1.0 - p, p])
+        raw = raw - raw.max(axis=1, keepdims=True)
+        e = np.exp(raw)
+        return e / e.sum(axis=1, keepdims=True)
@@ -0,0 +1,264 @@
+# app/ml/hparam_search.py
+"""
+Time-budgeted hyperparameter search for the alert model.
+
+Configurations are sampled for every candidate family and raced with
+successive halving: all of them are fitted on a small stratified subset of
+the training data, the best 1/eta move on to a subset eta times larger,
+and so on. Every trial is logged to MLflow under the alert experiment.
+When the budget runs out the best configuration seen on the largest
+subset is refitted on the full training split and promoted.
+
+The budget covers the refit too. Fits cannot be interrupted, so before
+each trial its duration and the refit's are estimated from the fit time
+per sample measured so far (the config's own on its last rung, else the
+average over all trials), and the search stops when they would not both fit in
+the time left. Scaling linearly in the sample count errs on the long
+side (ensembles have a per-estimator fixed cost), so tight budgets end
+early rather than late.
+"""
+
+import math
+import time
+import random
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import (
+    RandomForestClassifier,
+    GradientBoostingClassifier,
+    ExtraTreesClassifier,
+    AdaBoostClassifier,
+)
+from sklearn.neighbors import KNeighborsClassifier
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import StandardScaler
+from sklearn.metrics import f1_score
+from sklearn.model_selection import train_test_split
+
+from app.ml.model_manager import (
+    ALERT_EXPERIMENT,
+    ALERT_FAMILY,
+    XGBOOST_AVAILABLE,
+    _ensure_dirs,
+    _load_training_data_from_db,
+    _train_candidate,
+    promote_alert_model,
+)
+from app.ml.retention import prune_after_run
+from app.ml.tracking import tracker
+
+if XGBOOST_AVAILABLE:
+    from xgboost import XGBClassifier
+
+
+def _log_uniform(lo: float, hi: float):
+    return lambda rng: float(math.exp(rng.uniform(math.log(lo), math.log(hi))))
+
+
+def _choice(*values):
+    return lambda rng: rng.choice(values)
+
+
+_TREE_SPACE = {
+    "n_estimators": _choice(50, 100, 200, 400),
+    "max_depth": _choice(None, 6, 10, 20),
+    "min_samples_leaf": _choice(1, 2, 4),
+    "max_features": _choice("sqrt", 0.5, None),
+}
+
+# family -> (estimator class, sampled params, fixed params)
+SEARCH_SPACES = {
+    "logreg": (LogisticRegression, {"C": _log_uniform(1e-3, 1e2)}, {"max_iter": 2000}),
+    "rf": (RandomForestClassifier, _TREE_SPACE, {}),
+    "extra_trees": (ExtraTreesClassifier, _TREE_SPACE, {}),
+    "gb": (GradientBoostingClassifier, {
+        "n_estimators": _choice(50, 100, 200),
+        "learning_rate": _log_uniform(0.01, 0.3),
+        "max_depth": _choice(2, 3, 4),
+        "subsample": _choice(0.7, 0.85, 1.0),
+    }, {}),
+    "knn": (KNeighborsClassifier, {
+        "n_neighbors": _choice(3, 5, 9, 15, 25),
+        "weights": _choice("uniform", "distance"),
+    }, {}),
+    "adaboost": (AdaBoostClassifier, {
+        "n_estimators": _choice(50, 100, 200),
+        "learning_rate": _log_uniform(0.05, 1.0),
+    }, {}),
+}
+
+if XGBOOST_AVAILABLE:
+    SEARCH_SPACES["xgboost"] = (XGBClassifier, {
+        "n_estimators": _choice(100, 200, 400),
+        "max_depth": _choice(3, 4, 6, 8),
+        "learning_rate": _log_uniform(0.02, 0.3),
+        "subsample": _choice(0.7, 0.85, 1.0),
+    }, {"eval_metric": "mlogloss"})
+
+
+def _sample_configs(n_per_family: int, seed: int) -> List[Dict]:
+    rng = random.Random(seed)
+    configs = []
+    for family, (_, space, _) in SEARCH_SPACES.items():
+        for _ in range(n_per_family):
+            configs.append({
+                "family": family,
+                "params": {name: sample(rng) for name, sample in space.items()},
+            })
+    return configs
+
+
+def _build(config: Dict):
+    cls, _, fixed = SEARCH_SPACES[config["family"]]
+    return cls(**fixed, **config["params"])
+
+
+def _stratified_order(y: np.ndarray, seed: int) -> np.ndarray:
+    """Shuffled order in which every prefix keeps the class proportions."""
+    perm = np.random.default_rng(seed).permutation(len(y))
+    y_perm = y[perm]
+    frac = np.empty(len(perm))
+    for c in np.unique(y_perm):
+        idx = np.flatnonzero(y_perm == c)
+        frac[idx] = (np.arange(len(idx)) + 0.5) / len(idx)
+    return perm[np.argsort(frac, kind="stable")]
+
+
+def _rung_sizes(n_configs: int, n_max: int, eta: int, min_samples: int) -> List[int]:
+    by_configs = int(math.log(max(n_configs, 1), eta)) + 1
+    by_data = int(math.log(max(n_max / min_samples, 1), eta)) + 1
+    n_rungs = max(1, min(by_configs, by_data))
+    return [int(n_max / eta ** (n_rungs - 1 - r)) for r in range(n_rungs)]
+
+
+def _run_trial(config: Dict, rung: int, X_fit, y_fit, X_val, y_val) -> Tuple[float, float]:
+    """(macro F1 on the validation split, fit seconds)."""
+    with tracker.start_run(ALERT_EXPERIMENT, run_name=f"search_{config['family']}_r{rung}") as run:
+        run.log_param("model", config["family"])
+        run.log_param("rung", rung)
+        run.log_param("n_samples", len(X_fit))
+        run.log_params(config["params"])
+
+        started = time.monotonic()
+        try:
+            pipe = Pipeline([("scaler", StandardScaler()), ("clf", _build(config))])
+            pipe.fit(X_fit, y_fit)
+            score = float(f1_score(y_val, pipe.predict(X_val), average="macro"))
+        except ValueError as e:
+            # e.g. more neighbours than samples on a tiny rung
+            run.set_tag("error", str(e))
+            score = -1.0
+
+        fit_seconds = time.monotonic() - started
+        run.log_metric("f1_macro", score)
+    return score, fit_seconds
+
+
+def search_alert_model(
+    budget_seconds: float = 600.0,
+    configs_per_family: int = 6,
+    eta: int = 3,
+    min_samples: int = 50,
+    seed: int = 42,
+    progress: Optional[Callable[[str, Dict], None]] = None,
+) -> Dict:
+    """
+    Successive-halving search over all candidate families within a
+    wall-clock budget, then promote the overall winner.
+    """
+    report = progress or (lambda candidate, update: None)
+    search_started = time.monotonic()
+    deadline = search_started + budget_seconds
+
+    _ensure_dirs()
+    X, y = _load_training_data_from_db()
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.25, stratify=y, random_state=42
+    )
+    # halving is scored on a validation split; the test split stays untouched
+    X_fit, X_val, y_fit, y_val = train_test_split(
+        X_train, y_train, test_size=0.2, stratify=y_train, random_state=seed
+    )
+    order = _stratified_order(y_fit, seed)
+    X_fit, y_fit = X_fit[order], y_fit[order]
+
+    survivors = _sample_configs(configs_per_family, seed)
+    sizes = _rung_sizes(len(survivors), len(X_fit), eta, min_samples)
+    best = None  # (rung, score, config)
+    n_trials = 0
+    out_of_budget = False
+    # id(config) -> fit seconds per training sample on its last rung
+    rates: Dict[int, float] = {}
+
+    def rate(config: Dict) -> float:
+        if id(config) in rates:
+            return rates[id(config)]
+        return sum(rates.values()) / len(rates) if rates else 0.0
+
+    for rung, n_samples in enumerate(sizes):
+        scored = []
+        for config in survivors:
+            expected = rate(config) * n_samples
+            refit = max(rate(config), rate(best[2]) if best else 0.0) * len(X_train)
+            if time.monotonic() + expected + refit >= deadline:
+                out_of_budget = True
+                break
+            score, fit_seconds = _run_trial(config, rung, X_fit[:n_samples], y_fit[:n_samples], X_val, y_val)
+            rates[id(config)] = fit_seconds / n_samples
+            n_trials += 1
+            scored.append((score, config))
+            if best is None or (rung, score) > (best[0], best[1]):
+                best = (rung, score, config)
+
+        report(f"rung_{rung}", {
+            "status": "done" if not out_of_budget else "budget_exhausted",
+            "n_samples": n_samples,
+            "trials": len(scored),
+            "best_f1_macro": max((sc for sc, _ in scored), default=None),
+        })
+
+        if out_of_budget or rung == len(sizes) - 1:
+            break
+        scored.sort(key=lambda item: item[0], reverse=True)
+        survivors = [config for _, config in scored[:max(1, len(scored) // eta)]]
+
+    if best is None:
+        raise ValueError("Search budget too small to evaluate any configuration.")
+
+    _, val_f1, config = best
+    report("final", {"status": "running", "model": config["family"]})
+    refit_started = time.monotonic()
+    final = _train_candidate(
+        config["family"], _build(config), X_train, y_train, X_test, y_test,
+        params=config["params"],
+    )
+    compiled_path = promote_alert_model(final, extra={
+        "params": config["params"],
+        "search_val_f1_macro": val_f1,
+    })
+    refit_seconds = time.monotonic() - refit_started
+    retention = prune_after_run(ALERT_FAMILY)
+    report("final", {"status": "done", "f1_macro": final["f1_macro"]})
+
+    return {
+        "status": "searched_on_real_db",
+        "best_model": final["key"],
+        "params": config["params"],
+        "accuracy": final["accuracy"],
+        "f1_macro": final["f1_macro"],
+        "val_f1_macro": val_f1,
+        "model_path": final["model_path"],
+        "compiled_path": compiled_path,
+        "mlflow_run_id": final["mlflow_run_id"],
+        "trials": n_trials,
+        "rung_sizes": sizes,
+        "budget_exhausted": out_of_budget,
+        # the refit counts against the budget; the estimates can still be off
+        "budget_seconds": budget_seconds,
+        "elapsed_seconds": round(time.monotonic() - search_started, 3),
+        "refit_seconds": round(refit_seconds, 3),
+        "retention": retention,
+    }
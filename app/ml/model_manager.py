@@ -1,11 +1,13 @@
 import os
-import json
+import time
+import hashlib
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Callable, Dict, Iterator, List, Optional, Sequence
 
 import numpy as np
-import mlflow
-import mlflow.sklearn
 
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import (
@@ -21,9 +23,18 @@ from sklearn.metrics import accuracy_score, f1_score
 from sklearn.model_selection import train_test_split
 
 from joblib import dump, load
+from sqlalchemy import select, delete, func, or_, and_, event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 
-from app.database.db import SessionLocal
+from app.database.db import Base, SessionLocal, engine, sync_schema
 from app.database.twin_schema import Twin
+from app.database.mlops_schema import TwinFeatureRow
+from app.ml import model_registry
+from app.ml.compiled_model import CompiledModel, export_compiled
+from app.ml.retention import prune_after_run
+from app.ml.shadow import shadow_scorer
+from app.ml.tracking import tracker
+from app.utils.cache import TTLCache
 
 # ✅ Optional XGBoost
 try:
@@ -33,41 +44,142 @@ except:
     XGBOOST_AVAILABLE = False
 
 MODELS_DIR = "models"
+# legacy JSON registry, imported into the DB registry on first use
 META_PATH = os.path.join(MODELS_DIR, "models_meta.json")
 
+ALERT_FAMILY = "alert"
+
 # =========================
-# FILE + META HELPERS
+# FILE + REGISTRY HELPERS
 # =========================
 
 def _ensure_dirs():
     os.makedirs(MODELS_DIR, exist_ok=True)
-    if not os.path.exists(META_PATH):
-        with open(META_PATH, "w") as f:
-            json.dump({"models": []}, f)
-
-def _load_meta() -> Dict:
-    _ensure_dirs()
-    with open(META_PATH, "r") as f:
-        return json.load(f)
-
-def _save_meta(meta: Dict):
-    with open(META_PATH, "w") as f:
-        json.dump(meta, f, indent=2)
+    model_registry.ensure_family(ALERT_FAMILY, legacy_meta_path=META_PATH)
 
 def get_registered_models() -> List[Dict]:
-    return _load_meta().get("models", [])
+    model_registry.ensure_family(ALERT_FAMILY, legacy_meta_path=META_PATH)
+    return model_registry.get_models(ALERT_FAMILY)
 
 def get_active_model_path() -> Optional[str]:
-    meta = _load_meta().get("models", [])
-    active = [m for m in meta if m.get("active")]
-    return active[-1]["path"] if active else None
+    model_registry.ensure_family(ALERT_FAMILY, legacy_meta_path=META_PATH)
+    return model_registry.get_active_path(ALERT_FAMILY)
 
 def get_active_model_info() -> Optional[Dict]:
-    meta = _load_meta().get("models", [])
-    for m in reversed(meta):
-        if m.get("active"):
-            return m
-    return None
+    model_registry.ensure_family(ALERT_FAMILY, legacy_meta_path=META_PATH)
+    return model_registry.get_active(ALERT_FAMILY)
+
+# =========================
+# RESIDENT ACTIVE MODEL ✅
+# =========================
+
+class _ActiveModelHolder:
+    """
+    Process-wide holder for the active alert pipeline.
+
+    The model is loaded once and kept in memory. Each lookup asks the
+    (cached) registry for the active entry; when another worker promotes a
+    model the new one is loaded on the next call. The compiled export is
+    preferred over the sklearn pipeline when one exists, and is
+    memory-mapped so all workers share its pages.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (model, path) swapped as a single tuple
+        self._state = (None, None)
+        self.load_stats: Dict = {}
+
+    def get(self):
+        info = get_active_model_info()
+        if not info:
+            return None, None
+
+        model, path = self._state
+        if model is not None and path == info["path"]:
+            return model, path
+
+        with self._lock:
+            model, path = self._state
+            if model is None or path != info["path"]:
+                started = time.perf_counter()
+                model, path = _load_for_inference(info), info["path"]
+                self._install(model, path, time.perf_counter() - started)
+            return model, path
+
+    def swap(self, model, path: str, load_seconds: Optional[float] = None):
+        """Install a freshly promoted model without reloading it from disk."""
+        with self._lock:
+            self._install(model, path, load_seconds)
+
+    def _install(self, model, path: str, load_seconds: Optional[float]):
+        self._state = (model, path)
+        _prediction_cache.clear()
+        self.load_stats = {
+            "path": path,
+            "loaded_at": datetime.utcnow().isoformat(),
+            "load_seconds": round(load_seconds, 6) if load_seconds is not None else None,
+            **_describe_model(model),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._state = (None, None)
+            self.load_stats = {}
+
+
+def _load_for_inference(info: Dict):
+    compiled_path = info.get("compiled_path")
+    if compiled_path and os.path.exists(compiled_path):
+        return CompiledModel.load(compiled_path)
+    # uncompressed pipelines map their plain arrays (knn data...) as well
+    return load(info["path"], mmap_mode="r")
+
+
+def _describe_model(model) -> Dict:
+    if isinstance(model, CompiledModel):
+        return {"format": "compiled", "mmap": model.mmapped, "array_bytes": model.nbytes}
+    return {"format": "pipeline", "mmap": False, "array_bytes": None}
+
+
+def process_memory() -> Dict:
+    """
+    Resident memory of this process (Linux /proc). rss_file counts mapped
+    file pages, which are shared between workers; pss splits shared pages
+    between the processes mapping them.
+    """
+    fields = {
+        "VmRSS": "rss_bytes", "RssAnon": "rss_anon_bytes",
+        "RssFile": "rss_file_bytes", "Pss": "pss_bytes",
+    }
+    memory = {}
+    for proc_file in ("/proc/self/status", "/proc/self/smaps_rollup"):
+        try:
+            with open(proc_file, "r") as f:
+                for line in f:
+                    key, _, value = line.partition(":")
+                    if key in fields:
+                        memory[fields[key]] = int(value.split()[0]) * 1024
+        except OSError:
+            continue
+    return memory
+
+
+_active_model = _ActiveModelHolder()
+
+
+def get_active_model():
+    """Return (model, path) for the active alert model, or (None, None)."""
+    return _active_model.get()
+
+
+def active_model_load_stats() -> Dict:
+    """How the resident alert model was loaded, plus this worker's memory."""
+    return {
+        "worker_pid": os.getpid(),
+        **_active_model.load_stats,
+        "memory": process_memory(),
+    }
 
 # =========================
 # FEATURE ENCODERS
@@ -136,39 +248,236 @@ def _build_label(t: Twin) -> int:
     else:
         return 3
 
+# =========================
+# VECTORIZED FEATURE MATRIX ✅
+# =========================
+
+# (column, default) in _build_feature_vector order after age/gender/bmi.
+# Defaults replace any falsy value, exactly like the `or` fallbacks above.
+_IMPUTED_COLUMNS = [
+    ("spo2", 97),
+    ("resting_hr", 72),
+    ("sleep_hours", 7),
+    ("screen_time_hours", 6),
+    ("exercise_level", 1),
+    ("smoking", 0),
+    ("alcohol", 0),
+    ("daily_steps", 4000),
+    ("outside_food_per_week", 3),
+    ("tea_coffee_per_day", 2),
+    ("diet_type", None),
+    ("income", 600000),
+    ("aqi", 120),
+    ("commute_hours", 1.0),
+    ("ac_exposure_hours", 4.0),
+    ("heart_score", 0.3),
+    ("metabolic_score", 0.3),
+    ("mental_stress_score", 0.3),
+    ("lung_risk_score", 0.3),
+    ("organ_load_score", 0.4),
+]
+
+FEATURE_COLUMNS = ["age", "gender", "height_cm", "weight_kg"] + [
+    name for name, _ in _IMPUTED_COLUMNS
+]
+N_FEATURES = 23
+
+
+def _encode_column(values: np.ndarray, encoder) -> np.ndarray:
+    # few distinct values per column: encode each once, then map
+    codes = {v: encoder(v) for v in set(values.tolist())}
+    return np.fromiter((codes[v] for v in values.tolist()), dtype=float, count=len(values))
+
+
+def _or_default(values: np.ndarray, default: float) -> np.ndarray:
+    arr = np.asarray(values, dtype=float)  # None -> nan
+    return np.where(np.isnan(arr) | (arr == 0), default, arr)
+
+
+def _build_feature_matrix(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Vectorized equivalent of _build_feature_vector for many twins.
+    `columns` maps each name in FEATURE_COLUMNS to a 1-D array of raw values.
+    """
+    n = len(columns["age"])
+    X = np.empty((n, N_FEATURES), dtype=float)
+
+    height = np.asarray(columns["height_cm"], dtype=float)
+    weight = np.asarray(columns["weight_kg"], dtype=float)
+
+    X[:, 0] = np.asarray(columns["age"], dtype=float)
+    X[:, 1] = _encode_column(np.asarray(columns["gender"], dtype=object), _encode_gender)
+    X[:, 2] = weight / ((height / 100) ** 2)
+
+    for i, (name, default) in enumerate(_IMPUTED_COLUMNS, start=3):
+        if name == "diet_type":
+            X[:, i] = _encode_column(np.asarray(columns[name], dtype=object), _encode_diet)
+        else:
+            X[:, i] = _or_default(columns[name], default)
+
+    return X
+
+
+def _build_labels(organ_load: np.ndarray) -> np.ndarray:
+    """Vectorized _build_label: organ load bands 0.4 / 0.6 / 0.8."""
+    ol = np.nan_to_num(np.asarray(organ_load, dtype=float), nan=0.0)
+    return np.digitize(ol, [0.4, 0.6, 0.8])
+
+
+def _rows_to_columns(rows: Sequence, names: Sequence[str]) -> Dict[str, np.ndarray]:
+    cols = list(zip(*rows)) if rows else [()] * len(names)
+    return {name: np.array(col, dtype=object) for name, col in zip(names, cols)}
+
+# =========================
+# INCREMENTAL FEATURE STORE ✅
+# =========================
+
+TRAINING_CHUNK_SIZE = 10000
+
+_feature_store_ready = False
+
+
+def _ensure_feature_store():
+    global _feature_store_ready
+    if not _feature_store_ready:
+        Base.metadata.create_all(bind=engine, tables=[TwinFeatureRow.__table__])
+        sync_schema([Twin.__table__])  # twins.updated_at on older DBs
+        _feature_store_ready = True
+
+
+def _stale_twins_query(after_id: int, limit: int):
+    # twins never snapshotted, or updated since their snapshot; one keyset
+    # page on twins.id
+    t = Twin.__table__
+    f = TwinFeatureRow.__table__
+    return (
+        select(t.c.id, t.c.updated_at, *[t.c[c] for c in FEATURE_COLUMNS])
+        .select_from(t.outerjoin(f, f.c.twin_id == t.c.id))
+        .where(
+            t.c.id > after_id,
+            or_(
+                f.c.twin_id.is_(None),
+                and_(
+                    t.c.updated_at.isnot(None),
+                    or_(
+                        f.c.source_updated_at.is_(None),
+                        t.c.updated_at > f.c.source_updated_at,
+                    ),
+                ),
+            ),
+        )
+        .order_by(t.c.id)
+        .limit(limit)
+    )
+
+
+def refresh_feature_store(chunk_size: int = TRAINING_CHUNK_SIZE) -> Dict:
+    """
+    Bring the twin_features snapshot up to date: recompute only rows of
+    twins that are new or changed (Twin.updated_at) and drop rows of
+    deleted twins. Cost is proportional to churn, not population.
+
+    Stale twins are read in keyset pages of `chunk_size`, and each page is
+    upserted in its own short transaction, so even the first refresh of
+    an existing database holds one page in memory and SQLite's write
+    lock for one page at a time.
+    """
+    _ensure_feature_store()
+    f = TwinFeatureRow.__table__
+
+    upsert = sqlite_insert(f)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[f.c.twin_id],
+        set_={
+            c: upsert.excluded[c]
+            for c in ("features", "label", "source_updated_at", "computed_at")
+        },
+    )
+    names = ["id", "updated_at"] + FEATURE_COLUMNS
+    now = datetime.utcnow()
+
+    with engine.begin() as conn:
+        deleted = conn.execute(
+            delete(f).where(f.c.twin_id.not_in(select(Twin.__table__.c.id)))
+        ).rowcount
+
+    recomputed = 0
+    last_id = 0
+    while True:
+        # the page is read completely before its write transaction starts
+        with engine.connect() as conn:
+            rows = conn.execute(_stale_twins_query(last_id, chunk_size)).all()
+        if not rows:
+            break
+        last_id = rows[-1].id
+
+        cols = _rows_to_columns(rows, names)
+        X = _build_feature_matrix(cols)
+        y = _build_labels(cols["organ_load_score"])
+        with engine.begin() as conn:
+            conn.execute(upsert, [
+                {
+                    "twin_id": row.id,
+                    "features": X[i].tobytes(),
+                    "label": int(y[i]),
+                    "source_updated_at": row.updated_at,
+                    "computed_at": now,
+                }
+                for i, row in enumerate(rows)
+            ])
+        recomputed += len(rows)
+
+    return {"recomputed": recomputed, "deleted": deleted}
+
+
+def _features_from_blobs(blobs: Sequence[bytes]) -> np.ndarray:
+    return np.frombuffer(b"".join(blobs), dtype=float).reshape(-1, N_FEATURES)
+
 # =========================
 # LOAD DATA FROM DB ✅ REAL DB
 # =========================
 
-def _load_training_data_from_db():
-    db = SessionLocal()
-    twins = db.query(Twin).all()
-    db.close()
+def _load_training_data_from_db(chunk_size: int = TRAINING_CHUNK_SIZE):
+    """
+    Refresh the feature store (changed twins only), then stream the stored
+    feature rows chunk by chunk into preallocated X / y arrays.
+    """
+    refresh_feature_store(chunk_size)
 
-    if len(twins) < 10:
-        raise ValueError("Not enough twins to train model.")
+    f = TwinFeatureRow.__table__
+    stmt = select(f.c.features, f.c.label).order_by(f.c.twin_id)
 
-    X, y = [], []
-    for t in twins:
-        X.append(_build_feature_vector(t))
-        y.append(_build_label(t))
+    with engine.connect() as conn:
+        n = conn.execute(select(func.count()).select_from(f)).scalar_one()
+        if n < 10:
+            raise ValueError("Not enough twins to train model.")
 
-    return np.array(X), np.array(y)
+        X = np.empty((n, N_FEATURES), dtype=float)
+        y = np.empty(n, dtype=int)
+        pos = 0
+
+        result = conn.execution_options(stream_results=True).execute(stmt)
+        for rows in result.partitions(chunk_size):
+            end = pos + len(rows)
+            if end > len(X):
+                # rows added since the count: grow instead of failing
+                X = np.resize(X, (end, N_FEATURES))
+                y = np.resize(y, end)
+
+            X[pos:end] = _features_from_blobs([r.features for r in rows])
+            y[pos:end] = [r.label for r in rows]
+            pos = end
+
+    return X[:pos], y[:pos]
 
 # =========================
 # FULL MLOPS RETRAIN ✅ 7 MODELS
 # =========================
 
-def retrain_alert_model() -> Dict:
-    _ensure_dirs()
-    X, y = _load_training_data_from_db()
+ALERT_EXPERIMENT = "bodytwin_alert_models"
 
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.25, stratify=y, random_state=42
-    )
-
-    mlflow.set_experiment("bodytwin_alert_models")
 
+def _candidate_models() -> Dict:
     models = {
         "logreg": LogisticRegression(max_iter=2000),
         "rf": RandomForestClassifier(n_estimators=200),
@@ -181,58 +490,174 @@ def retrain_alert_model() -> Dict:
     if XGBOOST_AVAILABLE:
         models["xgboost"] = XGBClassifier(eval_metric="mlogloss")
 
-    best_model_path = None
-    best_f1 = -1
-    best_acc = 0
-    best_key = None
-    best_run = None
-
-    for key, clf in models.items():
-        with mlflow.start_run(run_name=f"alert_{key}") as run:
-            pipe = Pipeline([
-                ("scaler", StandardScaler()),
-                ("clf", clf),
-            ])
-
-            pipe.fit(X_train, y_train)
-            preds = pipe.predict(X_test)
+    return models
+
+
+def _train_candidate(
+    key, clf, X_train, y_train, X_test, y_test,
+    params: Optional[Dict] = None,
+    flush_tracking: bool = False,
+) -> Dict:
+    """
+    Fit, evaluate and persist one candidate in its own MLflow run.
+    Top-level so it can run inside a worker process. `params` (e.g. searched
+    hyperparameters) are logged alongside the model key.
+
+    The joblib file is the only serialized copy of the model; the run is
+    tagged with its path. Tracking data is written in the background, so
+    pool workers pass flush_tracking=True to write it before returning.
+    """
+    with tracker.start_run(ALERT_EXPERIMENT, run_name=f"alert_{key}") as run:
+        pipe = Pipeline([
+            ("scaler", StandardScaler()),
+            ("clf", clf),
+        ])
+
+        started = time.perf_counter()
+        pipe.fit(X_train, y_train)
+        train_seconds = time.perf_counter() - started
+        preds = pipe.predict(X_test)
+
+        acc = accuracy_score(y_test, preds)
+        f1 = f1_score(y_test, preds, average="macro")
+
+        run.log_metric("accuracy", acc)
+        run.log_metric("f1_macro", f1)
+        run.log_metric("train_seconds", train_seconds)
+        run.log_param("model", key)
+        if params:
+            run.log_params(params)
+
+        timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+        model_path = os.path.join(MODELS_DIR, f"alert_{key}_{timestamp}.joblib")
+
+        dump(pipe, model_path)
+        run.set_tag("model_path", model_path)
+
+        result = {
+            "key": key,
+            "accuracy": acc,
+            "f1_macro": f1,
+            "model_path": model_path,
+            "mlflow_run_id": run.run_id,
+            "train_seconds": round(train_seconds, 3),
+        }
+
+    if flush_tracking:
+        tracker.flush()
+    return result
+
+
+def _default_train_workers() -> int:
+    return int(os.getenv("ALERT_TRAIN_WORKERS", "0")) or (os.cpu_count() or 1)
+
+
+def promote_alert_model(best: Dict, extra: Optional[Dict] = None) -> Optional[str]:
+    """
+    Register a trained candidate (a _train_candidate result) as the active
+    alert model, export its compiled form and swap it into the resident
+    holder. Returns the compiled path, if the model could be compiled.
+    """
+    best_pipe = load(best["model_path"])
+    compiled_path = export_compiled(best_pipe, best["model_path"])
+    best_model, load_seconds = best_pipe, None
+    if compiled_path:
+        started = time.perf_counter()
+        best_model = CompiledModel.load(compiled_path)
+        load_seconds = time.perf_counter() - started
+
+    model_registry.register_model(ALERT_FAMILY, {
+        "name": os.path.basename(best["model_path"]),
+        "path": best["model_path"],
+        "model_type": best["key"],
+        "accuracy": best["accuracy"],
+        "f1_macro": best["f1_macro"],
+        **(extra or {}),
+        "mlflow_run_id": best["mlflow_run_id"],
+        "compiled_path": compiled_path,
+        "created_at": datetime.utcnow().isoformat(),
+    })
+    _active_model.swap(best_model, best["model_path"], load_seconds)
+    return compiled_path
 
-            acc = accuracy_score(y_test, preds)
-            f1 = f1_score(y_test, preds, average="macro")
 
-            mlflow.log_metric("accuracy", acc)
-            mlflow.log_metric("f1_macro", f1)
-            mlflow.log_param("model", key)
+def _candidate_done(r: Dict) -> Dict:
+    return {
+        "status": "done",
+        "accuracy": r["accuracy"],
+        "f1_macro": r["f1_macro"],
+        "train_seconds": r["train_seconds"],
+        "model_path": r["model_path"],
+    }
 
-            timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
-            model_path = os.path.join(MODELS_DIR, f"alert_{key}_{timestamp}.joblib")
 
-            dump(pipe, model_path)
-            mlflow.sklearn.log_model(pipe, artifact_path=f"model_{key}")
+def retrain_alert_model(
+    parallel: bool = False,
+    max_workers: Optional[int] = None,
+    progress: Optional[Callable[[str, Dict], None]] = None,
+) -> Dict:
+    """
+    Train every candidate, then promote the best one by macro F1.
 
-            if f1 > best_f1:
-                best_f1 = f1
-                best_acc = acc
-                best_model_path = model_path
-                best_key = key
-                best_run = run.info.run_id
+    parallel=True fits the candidates concurrently in a process pool
+    (max_workers, default ALERT_TRAIN_WORKERS or the CPU count); each
+    worker logs to its own MLflow run. `progress(candidate, update)` is
+    called as each candidate starts and finishes.
+    """
+    report = progress or (lambda candidate, update: None)
 
-    meta = _load_meta()
-    for m in meta["models"]:
-        m["active"] = False
+    _ensure_dirs()
+    X, y = _load_training_data_from_db()
 
-    meta["models"].append({
-        "name": os.path.basename(best_model_path),
-        "path": best_model_path,
-        "model_type": best_key,
-        "accuracy": best_acc,
-        "f1_macro": best_f1,
-        "mlflow_run_id": best_run,
-        "created_at": datetime.utcnow().isoformat(),
-        "active": True,
-    })
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.25, stratify=y, random_state=42
+    )
 
-    _save_meta(meta)
+    models = _candidate_models()
+
+    if parallel:
+        workers = min(max_workers or _default_train_workers(), len(models))
+        # spawn: workers must not inherit MLflow / DB state from this process
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+            futures = {}
+            for key, clf in models.items():
+                fut = pool.submit(
+                    _train_candidate, key, clf, X_train, y_train, X_test, y_test,
+                    flush_tracking=True,
+                )
+                futures[fut] = key
+                report(key, {"status": "running"})
+
+            by_key = {}
+            for fut in as_completed(futures):
+                r = fut.result()
+                by_key[r["key"]] = r
+                report(r["key"], _candidate_done(r))
+            results = [by_key[key] for key in models]
+    else:
+        results = []
+        for key, clf in models.items():
+            report(key, {"status": "running"})
+            r = _train_candidate(key, clf, X_train, y_train, X_test, y_test)
+            report(key, _candidate_done(r))
+            results.append(r)
+
+    # same first-wins tie-break as the sequential loop
+    best = None
+    for r in results:
+        if best is None or r["f1_macro"] > best["f1_macro"]:
+            best = r
+
+    compiled_path = promote_alert_model(best)
+    retention = prune_after_run(
+        ALERT_FAMILY, [r["model_path"] for r in results if r is not best]
+    )
+    best_model_path = best["model_path"]
+    best_key = best["key"]
+    best_acc = best["accuracy"]
+    best_f1 = best["f1_macro"]
+    best_run = best["mlflow_run_id"]
 
     return {
         "status": "trained_on_real_db",
@@ -240,30 +665,170 @@ def retrain_alert_model() -> Dict:
         "accuracy": best_acc,
         "f1_macro": best_f1,
         "model_path": best_model_path,
+        "compiled_path": compiled_path,
         "mlflow_run_id": best_run,
+        "retention": retention,
+        "candidates": {
+            r["key"]: {
+                "accuracy": r["accuracy"],
+                "f1_macro": r["f1_macro"],
+                "train_seconds": r["train_seconds"],
+            }
+            for r in results
+        },
     }
 
 # =========================
 # PREDICTION USING ACTIVE MODEL ✅
 # =========================
 
+ALERT_LABELS = {
+    0: "no_consult",
+    1: "routine_consult",
+    2: "specialist_consult",
+    3: "emergency",
+}
+
+# =========================
+# PREDICTION CACHE ✅
+# =========================
+
+PREDICTION_CACHE_SIZE = 50000
+PREDICTION_CACHE_TTL = 3600.0
+
+# (feature fingerprint, active model path) -> prediction
+_prediction_cache = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+# twin id -> (twin.updated_at, fingerprint): lets repeat polls skip the feature build
+_twin_fingerprints = TTLCache(maxsize=PREDICTION_CACHE_SIZE, ttl=PREDICTION_CACHE_TTL)
+
+
+def _fingerprint(features: np.ndarray) -> str:
+    return hashlib.blake2b(features.tobytes(), digest_size=16).hexdigest()
+
+
+@event.listens_for(Twin, "after_update")
+def _invalidate_twin_prediction(mapper, connection, twin):
+    _twin_fingerprints.pop(twin.id)
+
+
+def prediction_cache_stats() -> Dict:
+    return _prediction_cache.stats()
+
+
 def predict_alert_for_twin(twin: Twin) -> Dict:
-    path = get_active_model_path()
-    if not path:
+    model, path = get_active_model()
+    if model is None:
         return {"error": "No active model found"}
 
-    model = load(path)
-    features = np.array([_build_feature_vector(twin)])
+    features = None
+    known = _twin_fingerprints.get(twin.id)
+    if known is not None and known[0] == twin.updated_at:
+        fingerprint = known[1]
+    else:
+        features = np.array([_build_feature_vector(twin)])
+        fingerprint = _fingerprint(features)
+        _twin_fingerprints.set(twin.id, (twin.updated_at, fingerprint))
+
+    key = (fingerprint, path)
+    cached = _prediction_cache.get(key)
+    if cached is not None:
+        return dict(cached)
+
+    if features is None:
+        features = np.array([_build_feature_vector(twin)])
+    started = time.perf_counter()
     pred = int(model.predict(features)[0])
+    shadow_scorer.submit(features, pred, time.perf_counter() - started)
 
-    labels = {
-        0: "no_consult",
-        1: "routine_consult",
-        2: "specialist_consult",
-        3: "emergency",
-    }
-
-    return {
+    result = {
         "class_id": pred,
-        "label": labels[pred],
+        "label": ALERT_LABELS[pred],
     }
+    _prediction_cache.set(key, result)
+    return dict(result)
+
+# =========================
+# BATCH PREDICTION FOR COHORTS ✅
+# =========================
+
+_BATCH_ID_COLUMNS = ["id", "user_id", "name", "city"]
+
+
+def _cohort_query(
+    user_ids: Optional[Sequence[int]] = None,
+    city: Optional[str] = None,
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+):
+    table = Twin.__table__
+    f = TwinFeatureRow.__table__
+    stmt = (
+        select(*[table.c[c] for c in _BATCH_ID_COLUMNS], f.c.features)
+        .select_from(table.join(f, f.c.twin_id == table.c.id))
+    )
+
+    if user_ids is not None:
+        stmt = stmt.where(table.c.user_id.in_(list(user_ids)))
+    if city:
+        stmt = stmt.where(table.c.city == city)
+    if min_age is not None:
+        stmt = stmt.where(table.c.age >= min_age)
+    if max_age is not None:
+        stmt = stmt.where(table.c.age <= max_age)
+
+    return stmt.order_by(table.c.id)
+
+
+def _iter_cohort_predictions(model, stmt, chunk_size: int, with_proba: bool) -> Iterator[Dict]:
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=chunk_size))
+        for rows in result.partitions(chunk_size):
+            X = _features_from_blobs([r.features for r in rows])
+            preds = model.predict(X)
+            proba = model.predict_proba(X) if with_proba else None
+
+            for i, row in enumerate(rows):
+                pred = int(preds[i])
+                out = {
+                    "user_id": row.user_id,
+                    "twin_id": row.id,
+                    "name": row.name,
+                    "city": row.city,
+                    "class_id": pred,
+                    "label": ALERT_LABELS[pred],
+                }
+                if proba is not None:
+                    out["probabilities"] = {
+                        ALERT_LABELS[int(c)]: float(p)
+                        for c, p in zip(model.classes_, proba[i])
+                    }
+                yield out
+    finally:
+        db.close()
+
+
+def predict_alerts_for_twins(
+    user_ids: Optional[Sequence[int]] = None,
+    city: Optional[str] = None,
+    min_age: Optional[int] = None,
+    max_age: Optional[int] = None,
+    chunk_size: int = 5000,
+    with_proba: bool = False,
+) -> Iterator[Dict]:
+    """
+    Score a whole cohort with the active model.
+
+    Twins are selected by user IDs and/or city / age band. The feature
+    store is refreshed first (changed twins only), then stored feature rows
+    are read in chunks and each chunk is scored with a single predict call.
+    Returns an iterator yielding one dict per twin.
+    """
+    model, _ = get_active_model()
+    if model is None:
+        raise ValueError("No active model found")
+
+    refresh_feature_store()
+
+    stmt = _cohort_query(user_ids, city, min_age, max_age)
+    return _iter_cohort_predictions(model, stmt, chunk_size, with_proba)
@@ -0,0 +1,269 @@
+# app/ml/model_registry.py
+"""
+Model registry shared by every model family ("alert", "food"), stored in
+app.db instead of per-family JSON meta files.
+
+- promotion is one transaction: deactivate old, insert new, bump version
+- a partial unique index keeps exactly one active model per family
+- reads are served from a per-process cache that is revalidated against
+  the family's version row at most every REGISTRY_POLL_SECONDS
+"""
+
+import os
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from app.database.db import Base, SessionLocal, engine, sync_schema
+from app.database.mlops_schema import RegisteredModel, ModelRegistryVersion
+
+REGISTRY_POLL_SECONDS = 1.0
+
+_COLUMNS = (
+    "name", "path", "model_type", "compiled_path", "mlflow_run_id", "created_at",
+    "pruned_at", "compressed",
+)
+
+_lock = threading.Lock()
+_tables_ready = False
+_ready_families = set()
+# family -> {"version", "checked_at", "active", "models"}
+_cache: Dict[str, Dict] = {}
+
+
+# -----------------------------
+#  ROW <-> ENTRY
+# -----------------------------
+
+def _to_entry(row: RegisteredModel) -> Dict:
+    entry = {"id": row.id, "name": row.name, "path": row.path}
+    if row.model_type is not None:
+        entry["model_type"] = row.model_type
+    entry.update(row.info or {})
+    entry["mlflow_run_id"] = row.mlflow_run_id
+    entry["compiled_path"] = row.compiled_path
+    entry["created_at"] = row.created_at
+    entry["active"] = bool(row.active)
+    entry["pruned_at"] = row.pruned_at
+    entry["compressed"] = bool(row.compressed)
+    return entry
+
+
+def _from_entry(family: str, entry: Dict, active: bool) -> RegisteredModel:
+    fields = {k: entry.get(k) for k in _COLUMNS}
+    fields["created_at"] = fields["created_at"] or datetime.utcnow().isoformat()
+    fields["compressed"] = bool(fields["compressed"])
+    info = {
+        k: v for k, v in entry.items()
+        if k not in _COLUMNS and k not in ("id", "active")
+    }
+    return RegisteredModel(family=family, info=info, active=active, **fields)
+
+
+def _bump_version(db, family: str):
+    stmt = sqlite_insert(ModelRegistryVersion).values(family=family, version=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["family"],
+        set_={"version": ModelRegistryVersion.version + 1},
+    )
+    db.execute(stmt)
+
+
+# -----------------------------
+#  SETUP + LEGACY IMPORT
+# -----------------------------
+
+def _ensure_tables():
+    global _tables_ready
+    if not _tables_ready:
+        tables = [RegisteredModel.__table__, ModelRegistryVersion.__table__]
+        Base.metadata.create_all(bind=engine, tables=tables)
+        sync_schema(tables)
+        _tables_ready = True
+
+
+def ensure_family(family: str, legacy_meta_path: Optional[str] = None):
+    """
+    Make sure the registry tables exist and, the first time a family is
+    seen, import its legacy JSON meta file (if any).
+    """
+    if family in _ready_families:
+        return
+
+    with _lock:
+        if family in _ready_families:
+            return
+        _ensure_tables()
+
+        db = SessionLocal()
+        try:
+            if db.get(ModelRegistryVersion, family) is None:
+                entries = []
+                if legacy_meta_path and os.path.exists(legacy_meta_path):
+                    with open(legacy_meta_path, "r") as f:
+                        entries = json.load(f).get("models", [])
+
+                # the old readers used the last active entry
+                active_idx = max(
+                    (i for i, m in enumerate(entries) if m.get("active")),
+                    default=None,
+                )
+                # version row first: a concurrent importer fails on its PK
+                db.add(ModelRegistryVersion(family=family, version=1))
+                db.flush()
+                db.add_all([
+                    _from_entry(family, m, active=(i == active_idx))
+                    for i, m in enumerate(entries)
+                ])
+                db.commit()
+        except IntegrityError:
+            db.rollback()
+        finally:
+            db.close()
+
+        _ready_families.add(family)
+
+
+# -----------------------------
+#  READS (cached)
+# -----------------------------
+
+def registry_version(family: str) -> int:
+    with engine.connect() as conn:
+        version = conn.execute(
+            select(ModelRegistryVersion.version)
+            .where(ModelRegistryVersion.family == family)
+        ).scalar()
+    return version or 0
+
+
+def _load_active(family: str) -> Optional[Dict]:
+    db = SessionLocal()
+    try:
+        row = db.execute(
+            select(RegisteredModel)
+            .where(RegisteredModel.family == family, RegisteredModel.active.is_(True))
+        ).scalar_one_or_none()
+        return _to_entry(row) if row else None
+    finally:
+        db.close()
+
+
+def _snapshot(family: str) -> Dict:
+    now = time.monotonic()
+    snap = _cache.get(family)
+    if snap and now - snap["checked_at"] < REGISTRY_POLL_SECONDS:
+        return snap
+
+    version = registry_version(family)
+    if snap and snap["version"] == version:
+        snap["checked_at"] = now
+        return snap
+
+    # version is read before the data, so a concurrent promotion can only
+    # make this snapshot newer than its version (and trigger a re-read)
+    snap = {
+        "version": version,
+        "checked_at": now,
+        "active": _load_active(family),
+        "models": None,
+    }
+    _cache[family] = snap
+    return snap
+
+
+def get_active(family: str) -> Optional[Dict]:
+    return _snapshot(family)["active"]
+
+
+def get_active_path(family: str) -> Optional[str]:
+    active = get_active(family)
+    return active["path"] if active else None
+
+
+def get_models(family: str) -> List[Dict]:
+    """All registered models of a family, oldest first (read-only list)."""
+    snap = _snapshot(family)
+    if snap["models"] is None:
+        db = SessionLocal()
+        try:
+            rows = db.execute(
+                select(RegisteredModel)
+                .where(RegisteredModel.family == family)
+                .order_by(RegisteredModel.id)
+            ).scalars().all()
+            snap["models"] = [_to_entry(r) for r in rows]
+        finally:
+            db.close()
+    return snap["models"]
+
+
+def invalidate(family: Optional[str] = None):
+    with _lock:
+        if family is None:
+            _cache.clear()
+        else:
+            _cache.pop(family, None)
+
+
+# -----------------------------
+#  WRITES (transactional)
+# -----------------------------
+
+def register_model(family: str, entry: Dict, promote: bool = True) -> Dict:
+    """
+    Add a model to the registry. With promote=True the previous active
+    model is deactivated in the same transaction.
+    """
+    db = SessionLocal()
+    try:
+        if promote:
+            db.execute(
+                update(RegisteredModel)
+                .where(RegisteredModel.family == family, RegisteredModel.active.is_(True))
+                .values(active=False)
+            )
+        row = _from_entry(family, entry, active=promote)
+        db.add(row)
+        db.flush()
+        _bump_version(db, family)
+        db.commit()
+        saved = _to_entry(row)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    invalidate(family)
+    return saved
+
+
+def update_models(family: str, model_ids: List[int], **values) -> int:
+    """Set columns (e.g. pruned_at) on some models of a family; returns the row count."""
+    if not model_ids:
+        return 0
+
+    db = SessionLocal()
+    try:
+        result = db.execute(
+            update(RegisteredModel)
+            .where(RegisteredModel.family == family, RegisteredModel.id.in_(model_ids))
+            .values(**values)
+        )
+        _bump_version(db, family)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+    invalidate(family)
+    return result.rowcount
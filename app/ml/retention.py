@@ -0,0 +1,231 @@
+# app/ml/retention.py
+"""
+Retention and garbage collection of model artifacts.
+
+Every retrain writes one joblib file per candidate. Per family we keep:
+- the active model (never touched)
+- the last RETENTION_KEEP previous winners, optionally recompressed
+Older winners lose their files and are marked `pruned_at` in the registry
+(their metadata and MLflow run stay). Losing candidates are deleted right
+after their run; other unregistered files only once they are older than
+ORPHAN_GRACE_SECONDS, since they may belong to a retrain in progress.
+The shadow candidate is protected as well.
+
+    python -m app.ml.retention --family alert --keep 3 --compress --dry-run
+"""
+
+import os
+import json
+import time
+import argparse
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from joblib import dump, load
+
+from app.ml import model_registry
+from app.ml.compiled_model import COMPILED_SUFFIX, LEGACY_COMPILED_SUFFIX
+from app.ml.shadow import _read_candidate_path
+
+RETENTION_KEEP = int(os.getenv("MODEL_RETENTION_KEEP", "3"))
+RETENTION_COMPRESS = os.getenv("MODEL_RETENTION_COMPRESS", "0") == "1"
+ORPHAN_GRACE_SECONDS = 3600
+COMPRESS_LEVEL = 3
+
+MODEL_SUFFIXES = (".joblib", COMPILED_SUFFIX, LEGACY_COMPILED_SUFFIX)
+
+
+def _families() -> Dict[str, Tuple[str, Callable[[], None]]]:
+    """family -> (artifact directory, registry setup); imported lazily (cycle)."""
+    from app.ml.model_manager import ALERT_FAMILY, MODELS_DIR, _ensure_dirs
+    from app.nutrition.food_ml_model import FOOD_FAMILY, FOOD_MODELS_DIR, _ensure_food_dirs
+
+    return {
+        ALERT_FAMILY: (MODELS_DIR, _ensure_dirs),
+        FOOD_FAMILY: (FOOD_MODELS_DIR, _ensure_food_dirs),
+    }
+
+
+def _abs(path: Optional[str]) -> Optional[str]:
+    return os.path.abspath(path) if path else None
+
+
+def _size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def _artifact_paths(entry: Dict) -> List[str]:
+    return [p for p in (entry.get("path"), entry.get("compiled_path")) if p]
+
+
+def _delete(path: str, report: Dict, reason: str):
+    size = _size(path)
+    if not report["dry_run"]:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            return
+        except OSError as e:
+            report["errors"].append(f"{path}: {e}")
+            return
+    report["deleted"].append({"path": path, "bytes": size, "reason": reason})
+    report["reclaimed_bytes"] += size
+
+
+def _compress(path: str, report: Dict) -> bool:
+    before = _size(path)
+    if report["dry_run"]:
+        # the compressed size is only known after compressing
+        report["compressed"].append({"path": path, "bytes_before": before, "bytes_after": None})
+        return True
+
+    try:
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        dump(load(path), tmp_path, compress=COMPRESS_LEVEL)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        report["errors"].append(f"{path}: {e}")
+        return False
+    after = _size(path)
+    report["compressed"].append({"path": path, "bytes_before": before, "bytes_after": after})
+    report["reclaimed_bytes"] += before - after
+    return True
+
+
+def collect_garbage(
+    family: str,
+    keep: int = RETENTION_KEEP,
+    compress: bool = RETENTION_COMPRESS,
+    dry_run: bool = False,
+    loser_paths: Iterable[str] = (),
+) -> Dict:
+    """
+    Apply the retention policy to one family and report what was (or,
+    with dry_run=True, would be) deleted and recompressed.
+    """
+    families = _families()
+    if family not in families:
+        raise ValueError(f"Unknown model family: {family}")
+    if keep < 0:
+        raise ValueError("keep must be >= 0")
+
+    models_dir, ensure = families[family]
+    ensure()
+    models = model_registry.get_models(family)
+
+    report = {
+        "family": family,
+        "dry_run": dry_run,
+        "kept": [],
+        "deleted": [],
+        "compressed": [],
+        "reclaimed_bytes": 0,
+        "errors": [],
+    }
+
+    protected = {_abs(_read_candidate_path())}
+    for m in models:
+        if m["active"]:
+            protected.update(_abs(p) for p in _artifact_paths(m))
+            report["kept"].append(m["path"])
+    registered = {_abs(p) for m in models for p in _artifact_paths(m)}
+
+    # previous winners, newest first
+    inactive = sorted(
+        (m for m in models if not m["active"] and not m["pruned_at"]),
+        key=lambda m: m["id"],
+        reverse=True,
+    )
+    kept, expired = inactive[:keep], inactive[keep:]
+
+    pruned_ids = []
+    for m in expired:
+        for path in _artifact_paths(m):
+            if _abs(path) not in protected and os.path.exists(path):
+                _delete(path, report, "expired")
+        pruned_ids.append(m["id"])
+
+    compressed_ids = []
+    for m in kept:
+        report["kept"].append(m["path"])
+        if compress and not m["compressed"] and _abs(m["path"]) not in protected:
+            if os.path.exists(m["path"]) and _compress(m["path"], report):
+                compressed_ids.append(m["id"])
+
+    losers = {_abs(p) for p in loser_paths}
+    cutoff = time.time() - ORPHAN_GRACE_SECONDS
+    if os.path.isdir(models_dir):
+        for item in os.scandir(models_dir):
+            path = _abs(item.path)
+            if not item.is_file() or not item.name.endswith(MODEL_SUFFIXES):
+                continue
+            if path in registered or path in protected:
+                continue
+            if path in losers:
+                _delete(item.path, report, "loser")
+            elif item.stat().st_mtime < cutoff:
+                _delete(item.path, report, "unregistered")
+
+    if not dry_run:
+        model_registry.update_models(family, pruned_ids, pruned_at=datetime.utcnow().isoformat())
+        model_registry.update_models(family, compressed_ids, compressed=True)
+
+    return report
+
+
+def collect_all(
+    keep: int = RETENTION_KEEP,
+    compress: bool = RETENTION_COMPRESS,
+    dry_run: bool = False,
+) -> Dict:
+    reports = [
+        collect_garbage(family, keep=keep, compress=compress, dry_run=dry_run)
+        for family in _families()
+    ]
+    return {
+        "reports": reports,
+        "reclaimed_bytes": sum(r["reclaimed_bytes"] for r in reports),
+    }
+
+
+def prune_after_run(family: str, loser_paths: Iterable[str] = ()) -> Dict:
+    """
+    Called once a retrain has promoted its winner. Returns a short summary;
+    a failing cleanup never fails the retrain itself.
+    """
+    try:
+        report = collect_garbage(family, loser_paths=loser_paths)
+    except Exception as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {
+        "deleted": len(report["deleted"]),
+        "compressed": len(report["compressed"]),
+        "reclaimed_bytes": report["reclaimed_bytes"],
+        "errors": report["errors"],
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Prune old model artifacts.")
+    parser.add_argument("--family", choices=sorted(_families()), default=None,
+                        help="model family (default: all)")
+    parser.add_argument("--keep", type=int, default=RETENTION_KEEP,
+                        help="previous winners to keep besides the active model")
+    parser.add_argument("--compress", action="store_true", default=RETENTION_COMPRESS,
+                        help="recompress the kept, inactive winners")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="only report what would be reclaimed")
+    args = parser.parse_args(argv)
+
+    if args.family:
+        result = collect_garbage(args.family, keep=args.keep, compress=args.compress, dry_run=args.dry_run)
+    else:
+        result = collect_all(keep=args.keep, compress=args.compress, dry_run=args.dry_run)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
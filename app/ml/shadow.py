@@ -0,0 +1,337 @@
+# app/ml/shadow.py
+"""
+Shadow scoring of a candidate alert model against live traffic.
+
+predict_alert_for_twin hands every feature vector it scored to
+`shadow_scorer.submit`, which is a non-blocking queue put (dropped when
+the queue is full or no candidate is configured). A daemon thread scores
+the queued vectors with the candidate and keeps a fixed-size rolling
+window of primary/shadow labels and latencies for /api/mlops/shadow.
+
+The candidate must be a registered alert model (joblib.load runs code
+from the pickle, so arbitrary paths are never loaded). It is configured
+in a small JSON file so every uvicorn worker shadows the same model. Each
+worker publishes its rolling window to SHADOW_STATS_DIR and
+/api/mlops/shadow merges the windows of all live workers.
+"""
+
+import os
+import json
+import atexit
+import time
+import glob
+import queue
+import threading
+from typing import Dict, List, Optional
+
+import numpy as np
+from joblib import load
+
+from app.ml.compiled_model import CompiledModel, compile_pipeline
+
+SHADOW_CONFIG_PATH = os.path.join("models", "shadow.json")
+SHADOW_STATS_DIR = os.path.join("models", "shadow_stats")
+SHADOW_WINDOW = 5000
+SHADOW_QUEUE_SIZE = 1000
+CONFIG_POLL_SECONDS = 1.0
+# a worker that has not published for this long is considered gone
+STATS_STALE_SECONDS = 30.0
+
+
+def _resolve_registered(model_id: Optional[int] = None, model_path: Optional[str] = None) -> Dict:
+    """
+    The registered, unpruned alert model with this id (or whose artifact is
+    this path) inside MODELS_DIR. Anything else is refused.
+    """
+    from app.ml.model_manager import MODELS_DIR, get_registered_models
+
+    models_dir = os.path.realpath(MODELS_DIR)
+    wanted = os.path.realpath(model_path) if model_path else None
+    for entry in get_registered_models():
+        path = os.path.realpath(entry["path"])
+        if model_id is not None and entry["id"] != model_id:
+            continue
+        if wanted is not None and path != wanted:
+            continue
+        if entry.get("pruned_at") or os.path.commonpath([models_dir, path]) != models_dir:
+            break
+        if not os.path.exists(path):
+            break
+        return entry
+    raise ValueError(f"Not a registered alert model: {model_id if model_id is not None else model_path}")
+
+
+def set_shadow_candidate(model_id: Optional[int] = None, model_path: Optional[str] = None) -> Dict:
+    if model_id is None and not model_path:
+        raise ValueError("model_id or model_path is required")
+    entry = _resolve_registered(model_id, model_path)
+
+    config = {"model_id": entry["id"], "model_path": entry["path"]}
+    tmp_path = f"{SHADOW_CONFIG_PATH}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(config, f)
+    os.replace(tmp_path, SHADOW_CONFIG_PATH)
+    return config
+
+
+def clear_shadow_candidate():
+    try:
+        os.remove(SHADOW_CONFIG_PATH)
+    except FileNotFoundError:
+        pass
+
+
+def _read_config() -> Dict:
+    try:
+        with open(SHADOW_CONFIG_PATH, "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+
+
+def _read_candidate_path() -> Optional[str]:
+    return _read_config().get("model_path")
+
+
+def _load_candidate(model_id: int):
+    # re-checked here too: the config file is only a pointer into the registry
+    pipe = load(_resolve_registered(model_id=model_id)["path"])
+    arrays = compile_pipeline(pipe)
+    return CompiledModel(arrays) if arrays is not None else pipe
+
+
+class _RollingWindow:
+    """Last `size` shadowed requests as compact NumPy ring buffers."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self.primary = np.zeros(size, dtype=np.int8)
+        self.shadow = np.zeros(size, dtype=np.int8)
+        self.primary_ms = np.zeros(size, dtype=np.float32)
+        self.shadow_ms = np.zeros(size, dtype=np.float32)
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def add(self, primary: int, shadow: int, primary_ms: float, shadow_ms: float):
+        with self._lock:
+            i = self.count % self.size
+            self.primary[i] = primary
+            self.shadow[i] = shadow
+            self.primary_ms[i] = primary_ms
+            self.shadow_ms[i] = shadow_ms
+            self.count += 1
+
+    def export(self) -> Dict[str, np.ndarray]:
+        with self._lock:
+            n = min(self.count, self.size)
+            return {
+                "primary": self.primary[:n].copy(),
+                "shadow": self.shadow[:n].copy(),
+                "primary_ms": self.primary_ms[:n].copy(),
+                "shadow_ms": self.shadow_ms[:n].copy(),
+                "total": np.array(self.count),
+            }
+
+
+def _summarize(primary, shadow, primary_ms, shadow_ms, total: int) -> Dict:
+    n = len(primary)
+    if n == 0:
+        return {"total_scored": total, "window": 0}
+
+    def pct(arr):
+        p50, p95, p99 = np.percentile(arr, [50, 95, 99])
+        return {"p50": float(p50), "p95": float(p95), "p99": float(p99), "mean": float(arr.mean())}
+
+    confusion = np.zeros((4, 4), dtype=int)
+    np.add.at(confusion, (primary, shadow), 1)
+
+    return {
+        "total_scored": total,
+        "window": n,
+        "agreement": float((primary == shadow).mean()),
+        "primary_latency_ms": pct(primary_ms),
+        "shadow_latency_ms": pct(shadow_ms),
+        # rows: primary label, columns: shadow label
+        "confusion": confusion.tolist(),
+    }
+
+
+class ShadowScorer:
+    def __init__(self, window: int = SHADOW_WINDOW, queue_size: int = SHADOW_QUEUE_SIZE):
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._window_size = window
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._enabled = False
+        self._candidate_id = None
+        self._candidate_path = None
+        self._candidate = None
+        self._window = _RollingWindow(window)
+        self._dropped = 0
+        self._error = None
+
+    # ---- request path: must stay O(1) and non-blocking ----
+
+    def submit(self, features: np.ndarray, primary_label: int, primary_seconds: float):
+        if self._thread is None:
+            self.start()
+        if not self._enabled:
+            return
+        try:
+            self._queue.put_nowait((features, primary_label, primary_seconds))
+        except queue.Full:
+            self._dropped += 1
+
+    # ---- background thread ----
+
+    def start(self):
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="alert-shadow", daemon=True
+                )
+                self._thread.start()
+
+    def _refresh_candidate(self):
+        config = _read_config()
+        model_id = config.get("model_id")
+        if model_id == self._candidate_id:
+            return
+
+        self._enabled = False
+        self._candidate, self._candidate_id, self._error = None, model_id, None
+        self._candidate_path = config.get("model_path")
+        self._window = _RollingWindow(self._window_size)
+        if model_id is not None:
+            try:
+                self._candidate = _load_candidate(model_id)
+                self._enabled = True
+            except Exception as e:
+                self._error = f"{type(e).__name__}: {e}"
+
+    def _stats_path(self) -> str:
+        return os.path.join(SHADOW_STATS_DIR, f"{os.getpid()}.npz")
+
+    def _publish(self):
+        """Write this worker's window for the cross-worker summary."""
+        path = self._stats_path()
+        if self._candidate_id is None:
+            self._unpublish()
+            return
+
+        os.makedirs(SHADOW_STATS_DIR, exist_ok=True)
+        meta = {
+            "pid": os.getpid(),
+            "model_id": self._candidate_id,
+            "enabled": self._enabled,
+            "queue_depth": self._queue.qsize(),
+            "dropped": self._dropped,
+            "error": self._error,
+        }
+        tmp_path = f"{path}.tmp"
+        # plain arrays plus a JSON string: readable without pickle
+        with open(tmp_path, "wb") as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **self._window.export())
+        os.replace(tmp_path, path)
+
+    def _unpublish(self):
+        try:
+            os.remove(self._stats_path())
+        except OSError:
+            pass
+
+    def _run(self):
+        atexit.register(self._unpublish)
+        self._refresh_candidate()
+        next_check = time.monotonic() + CONFIG_POLL_SECONDS
+        while True:
+            try:
+                item = self._queue.get(timeout=CONFIG_POLL_SECONDS)
+            except queue.Empty:
+                item = None
+
+            if time.monotonic() >= next_check:
+                self._refresh_candidate()
+                try:
+                    self._publish()
+                except OSError as e:
+                    self._error = f"{type(e).__name__}: {e}"
+                next_check = time.monotonic() + CONFIG_POLL_SECONDS
+
+            candidate = self._candidate
+            if item is None or candidate is None:
+                continue
+
+            features, primary_label, primary_seconds = item
+            started = time.perf_counter()
+            try:
+                shadow_label = int(candidate.predict(features)[0])
+            except Exception as e:
+                self._error = f"{type(e).__name__}: {e}"
+                continue
+            shadow_seconds = time.perf_counter() - started
+
+            self._window.add(
+                primary_label, shadow_label,
+                primary_seconds * 1000.0, shadow_seconds * 1000.0,
+            )
+
+    # ---- reporting ----
+
+    def summary(self) -> Dict:
+        """This worker only; see shadow_summary for all workers."""
+        window = self._window.export()
+        total = int(window.pop("total"))
+        return {
+            "worker_pid": os.getpid(),
+            "candidate_id": self._candidate_id,
+            "candidate_path": self._candidate_path,
+            "enabled": self._enabled,
+            "queue_depth": self._queue.qsize(),
+            "dropped": self._dropped,
+            "error": self._error,
+            **_summarize(**window, total=total),
+        }
+
+
+shadow_scorer = ShadowScorer()
+
+
+def shadow_summary() -> Dict:
+    """
+    Agreement and latency of the configured candidate over the windows of
+    every worker that published within STATS_STALE_SECONDS.
+    """
+    config = _read_config()
+    model_id = config.get("model_id")
+    now = time.time()
+    workers: List[Dict] = []
+    parts: Dict[str, List[np.ndarray]] = {k: [] for k in ("primary", "shadow", "primary_ms", "shadow_ms")}
+    total = 0
+
+    for path in glob.glob(os.path.join(SHADOW_STATS_DIR, "*.npz")):
+        try:
+            if now - os.path.getmtime(path) > STATS_STALE_SECONDS:
+                os.remove(path)  # its worker has exited
+                continue
+            with np.load(path, allow_pickle=False) as data:
+                meta = json.loads(str(data["meta"]))
+                if model_id is None or meta.get("model_id") != model_id:
+                    continue
+                for k in parts:
+                    parts[k].append(data[k])
+                total += int(data["total"])
+                workers.append({**meta, "window": int(len(data["primary"]))})
+        except (OSError, ValueError, KeyError):
+            continue  # being replaced or removed right now
+
+    merged = {k: (np.concatenate(v) if v else np.zeros(0)) for k, v in parts.items()}
+    merged["primary"] = merged["primary"].astype(np.int8)
+    merged["shadow"] = merged["shadow"].astype(np.int8)
+    return {
+        "candidate_id": model_id,
+        "candidate_path": config.get("model_path"),
+        "workers": sorted(workers, key=lambda w: w["pid"]),
+        "dropped": sum(w["dropped"] for w in workers),
+        **_summarize(**merged, total=total),
+    }
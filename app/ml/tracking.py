@@ -0,0 +1,133 @@
+# app/ml/tracking.py
+"""
+Buffered MLflow tracking for the training pipelines.
+
+A run is created synchronously (one call, to obtain its run id). Params,
+metrics and tags are buffered in memory and written with a single
+log_batch call by a background thread once the run ends, so training
+never waits on the tracking store.
+
+Model bytes are not logged to MLflow: the model registry owns the single
+serialized artifact and each run carries a `model_path` tag pointing at it.
+"""
+
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+from typing import Dict, List
+
+from mlflow.entities import Metric, Param, RunTag
+from mlflow.tracking import MlflowClient
+
+# MLflow's per-call log_batch limits
+_MAX_PARAMS_PER_BATCH = 100
+_MAX_METRICS_PER_BATCH = 1000
+
+
+class BufferedRun:
+    def __init__(self, run_id: str):
+        self.run_id = run_id
+        self.params: Dict[str, str] = {}
+        self.metrics: List[Metric] = []
+        self.tags: Dict[str, str] = {}
+
+    def log_param(self, key: str, value):
+        self.params[key] = str(value)
+
+    def log_params(self, params: Dict):
+        for key, value in params.items():
+            self.log_param(key, value)
+
+    def log_metric(self, key: str, value: float, step: int = 0):
+        self.metrics.append(Metric(key, float(value), int(time.time() * 1000), step))
+
+    def set_tag(self, key: str, value):
+        self.tags[key] = str(value)
+
+
+class MlflowTracker:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._client = None
+        self._thread = None
+        self._experiments: Dict[str, str] = {}
+        self.failed_flushes = 0
+
+    def _get_client(self) -> MlflowClient:
+        if self._client is None:
+            self._client = MlflowClient()
+        return self._client
+
+    def _experiment_id(self, name: str) -> str:
+        with self._lock:
+            if name not in self._experiments:
+                client = self._get_client()
+                exp = client.get_experiment_by_name(name)
+                self._experiments[name] = exp.experiment_id if exp else client.create_experiment(name)
+            return self._experiments[name]
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="mlflow-tracker", daemon=True
+                )
+                self._thread.start()
+                atexit.register(self.flush)
+
+    @contextmanager
+    def start_run(self, experiment: str, run_name: str):
+        """Create a run now; its data is written in bulk after the block."""
+        client = self._get_client()
+        run = client.create_run(self._experiment_id(experiment), run_name=run_name)
+        buffered = BufferedRun(run.info.run_id)
+
+        status = "FINISHED"
+        try:
+            yield buffered
+        except BaseException:
+            status = "FAILED"
+            raise
+        finally:
+            self._ensure_thread()
+            self._queue.put((buffered, status))
+
+    def _write(self, run: BufferedRun, status: str):
+        client = self._get_client()
+        params = [Param(k, v) for k, v in run.params.items()]
+        tags = [RunTag(k, v) for k, v in run.tags.items()]
+
+        client.log_batch(
+            run.run_id,
+            metrics=run.metrics[:_MAX_METRICS_PER_BATCH],
+            params=params[:_MAX_PARAMS_PER_BATCH],
+            tags=tags,
+        )
+        for i in range(_MAX_PARAMS_PER_BATCH, len(params), _MAX_PARAMS_PER_BATCH):
+            client.log_batch(run.run_id, params=params[i:i + _MAX_PARAMS_PER_BATCH])
+        for i in range(_MAX_METRICS_PER_BATCH, len(run.metrics), _MAX_METRICS_PER_BATCH):
+            client.log_batch(run.run_id, metrics=run.metrics[i:i + _MAX_METRICS_PER_BATCH])
+
+        client.set_terminated(run.run_id, status=status)
+
+    def _run(self):
+        while True:
+            run, status = self._queue.get()
+            try:
+                self._write(run, status)
+            except Exception:
+                # tracking must never break training
+                self.failed_flushes += 1
+            finally:
+                self._queue.task_done()
+
+    def flush(self):
+        """Block until every finished run has been written."""
+        if self._thread is not None:
+            self._queue.join()
+
+
+tracker = MlflowTracker()
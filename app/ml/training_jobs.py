@@ -0,0 +1,199 @@
+# app/ml/training_jobs.py
+"""
+Background retraining jobs.
+
+A retrain is submitted as a job and runs on a small thread pool, so the
+request handler returns a job ID at once. Job state is kept in one JSON
+file per job (shared by every uvicorn worker) and a per-family file lock
+makes sure two retrains of the same model family never overlap.
+
+The lock dies with its process, the job file does not: whoever next
+acquires a family's lock marks the family's still queued / running jobs
+as failed (interrupted), and app startup does so for every family.
+"""
+
+import os
+import json
+import time
+import uuid
+import fcntl
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+JOBS_DIR = os.path.join("models", "jobs")
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="retrain")
+_state_lock = threading.Lock()
+
+
+class JobConflictError(RuntimeError):
+    """Raised when a retrain of the same family is already running."""
+
+
+def _job_path(job_id: str) -> str:
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _lock_path(family: str) -> str:
+    return os.path.join(JOBS_DIR, f".{family}.lock")
+
+
+def _write_job(job: Dict):
+    tmp_path = f"{_job_path(job['job_id'])}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(job, f, indent=2)
+    os.replace(tmp_path, _job_path(job["job_id"]))
+
+
+def get_job(job_id: str) -> Optional[Dict]:
+    try:
+        with open(_job_path(job_id), "r") as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def list_jobs(family: Optional[str] = None, limit: Optional[int] = 20) -> List[Dict]:
+    if not os.path.isdir(JOBS_DIR):
+        return []
+
+    jobs = []
+    for name in os.listdir(JOBS_DIR):
+        if not name.endswith(".json"):
+            continue
+        job = get_job(name[:-len(".json")])
+        if job and (family is None or job["family"] == family):
+            jobs.append(job)
+
+    jobs.sort(key=lambda j: j["submitted_at"], reverse=True)
+    return jobs[:limit]
+
+
+def _acquire_family_lock(family: str):
+    fd = os.open(_lock_path(family), os.O_CREAT | os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        os.close(fd)
+        return None
+    return fd
+
+
+def _release_family_lock(fd: int):
+    fcntl.flock(fd, fcntl.LOCK_UN)
+    os.close(fd)
+
+
+def _fail_interrupted_jobs(family: str) -> int:
+    """
+    Mark the family's queued / running jobs as failed. Only call with the
+    family lock held: then no live process is running any of them.
+    """
+    stale = [j for j in list_jobs(family, limit=None) if j["status"] in ("queued", "running")]
+    for job in stale:
+        job["status"] = "failed"
+        job["error"] = "Interrupted: the process running this job exited"
+        job["finished_at"] = job["finished_at"] or datetime.utcnow().isoformat()
+        _write_job(job)
+    return len(stale)
+
+
+def recover_interrupted_jobs() -> int:
+    """
+    At startup: fail the jobs left queued / running by a process that
+    died, for every family whose lock is free. Returns how many.
+    """
+    families = {j["family"] for j in list_jobs(limit=None) if j["status"] in ("queued", "running")}
+    recovered = 0
+    for family in families:
+        lock_fd = _acquire_family_lock(family)
+        if lock_fd is None:
+            continue  # a live retrain holds it
+        try:
+            recovered += _fail_interrupted_jobs(family)
+        finally:
+            _release_family_lock(lock_fd)
+    return recovered
+
+
+def submit_retrain_job(family: str, train_fn: Callable[..., Dict], **kwargs) -> Dict:
+    """
+    Queue `train_fn(progress=..., **kwargs)` in the background.
+
+    train_fn reports per-candidate progress through the `progress`
+    callback and returns its usual result dict (model_path, metrics...).
+    Raises JobConflictError if this family is already being retrained.
+    """
+    os.makedirs(JOBS_DIR, exist_ok=True)
+
+    lock_fd = _acquire_family_lock(family)
+    if lock_fd is None:
+        running = [j for j in list_jobs(family) if j["status"] in ("queued", "running")]
+        job_id = running[0]["job_id"] if running else None
+        raise JobConflictError(f"Retrain of '{family}' is already running (job {job_id})")
+    try:
+        _fail_interrupted_jobs(family)
+
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "family": family,
+            "params": kwargs,
+            "status": "queued",
+            "submitted_at": datetime.utcnow().isoformat(),
+            "started_at": None,
+            "finished_at": None,
+            "duration_seconds": None,
+            "candidates": {},
+            "metrics": None,
+            "model_path": None,
+            "result": None,
+            "error": None,
+        }
+        _write_job(job)
+        submitted = json.loads(json.dumps(job))
+
+        _executor.submit(_run_job, job, train_fn, kwargs, lock_fd)
+        return submitted
+    except BaseException:
+        # only _run_job releases the lock; without it the family would
+        # answer "already running" until this worker restarts
+        _release_family_lock(lock_fd)
+        raise
+
+
+def _run_job(job: Dict, train_fn: Callable[..., Dict], kwargs: Dict, lock_fd: int):
+    started = time.perf_counter()
+
+    def progress(candidate: str, update: Dict):
+        with _state_lock:
+            job["candidates"].setdefault(candidate, {}).update(update)
+            _write_job(job)
+
+    try:
+        with _state_lock:
+            job["status"] = "running"
+            job["started_at"] = datetime.utcnow().isoformat()
+            _write_job(job)
+
+        result = train_fn(progress=progress, **kwargs)
+
+        with _state_lock:
+            job["status"] = "succeeded"
+            job["result"] = result
+            job["model_path"] = result.get("model_path")
+            job["metrics"] = {
+                k: v for k, v in result.items()
+                if k in ("accuracy", "f1_macro", "mae")
+            }
+    except Exception as e:
+        with _state_lock:
+            job["status"] = "failed"
+            job["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        with _state_lock:
+            job["finished_at"] = datetime.utcnow().isoformat()
+            job["duration_seconds"] = round(time.perf_counter() - started, 3)
+            _write_job(job)
+        _release_family_lock(lock_fd)
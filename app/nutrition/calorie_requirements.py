@@ -0,0 +1,149 @@
+# app/nutrition/calorie_requirements.py
+"""
+Nightly batch: today's required calories for every twin.
+
+Height, weight, age, sex and exercise level of all twins are read as
+NumPy columns, the Mifflin-St Jeor requirement is computed for all of
+them at once (same rules as nutrition_service._estimate_required_calories),
+and today's DailyCalorieSummary rows are bulk-upserted with it. After the
+run, the daily summary of any twin is a plain row lookup, and log_meal
+keeps the stored requirement when it adds the day's first meal.
+
+Run it shortly after midnight, e.g. from cron:
+
+    5 0 * * *  python -m app.nutrition.calorie_requirements
+"""
+
+import json
+import time
+import argparse
+from datetime import date
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from app.database.db import engine
+from app.database.twin_schema import Twin
+from app.nutrition.nutrition_models import DailyCalorieSummary
+from app.nutrition.nutrition_service import clear_required_calories_cache
+
+BATCH_CHUNK_SIZE = 100_000
+DEFAULT_REQUIRED_CALORIES = 2000.0
+
+# keeps calories already logged today; only the requirement is refreshed
+_UPSERT_SQL = f"""
+INSERT INTO {DailyCalorieSummary.__tablename__}
+    (twin_id, date, total_calories, required_calories, calorie_balance)
+VALUES (?, ?, 0.0, ?, ?)
+ON CONFLICT (twin_id, date) DO UPDATE SET
+    required_calories = excluded.required_calories,
+    calorie_balance = COALESCE(total_calories, 0.0) - excluded.required_calories
+"""
+
+
+def estimate_required_calories_batch(
+    height_cm: np.ndarray,
+    weight_kg: np.ndarray,
+    age: np.ndarray,
+    is_male: np.ndarray,
+    exercise_level: np.ndarray,
+) -> np.ndarray:
+    """
+    Vectorized _estimate_required_calories; missing values are NaN.
+    Matches it twin for twin, including its quirks: a missing or zero
+    height / weight / age gives 2000 kcal, and exercise_level 0 counts
+    as 1 (`exercise_level or 1`).
+    """
+    with np.errstate(invalid="ignore"):
+        bmr = 10 * weight_kg + 6.25 * height_cm - 5 * age + np.where(is_male, 5.0, -161.0)
+
+        level = np.where(np.isnan(exercise_level) | (exercise_level == 0), 1.0, exercise_level)
+        factor = np.select([level == 1, level == 2], [1.375, 1.55], 1.725)
+
+        known = np.ones(len(bmr), dtype=bool)
+        for col in (height_cm, weight_kg, age):
+            known &= ~np.isnan(col) & (col != 0)
+    return np.where(known, bmr * factor, DEFAULT_REQUIRED_CALORIES)
+
+
+# columns in the order estimate_required_calories_batch takes them
+_TWIN_COLUMNS_SQL = f"""
+SELECT id, height_cm, weight_kg, age,
+       CASE WHEN lower(substr(gender, 1, 1)) = 'm' THEN 1.0 ELSE 0.0 END,
+       exercise_level
+FROM {Twin.__tablename__}
+ORDER BY id
+"""
+
+
+def load_twin_columns(chunk_size: int = BATCH_CHUNK_SIZE) -> np.ndarray:
+    """
+    (n_twins, 6) float array: id, height_cm, weight_kg, age, is_male,
+    exercise_level, with NULL as NaN. Fetched as plain DBAPI tuples
+    (NumPy converts SQLAlchemy Row objects an order of magnitude slower)
+    and read completely before any write: an open SQLite read cursor
+    would block the writers' commits.
+    """
+    parts = []
+    with engine.connect() as conn:
+        cursor = conn.connection.cursor()
+        try:
+            cursor.execute(_TWIN_COLUMNS_SQL)
+            while rows := cursor.fetchmany(chunk_size):
+                parts.append(np.array(rows, dtype=float))
+        finally:
+            cursor.close()
+    return np.concatenate(parts) if parts else np.empty((0, 6))
+
+
+def run_required_calories_batch(day: Optional[date] = None, chunk_size: int = BATCH_CHUNK_SIZE) -> Dict:
+    """
+    Compute and store `day`'s (default: today's) required calories for all
+    twins; the upsert runs one transaction per chunk so meal logging can
+    interleave.
+    """
+    day = (day or date.today()).isoformat()
+    timings = {}
+
+    started = time.perf_counter()
+    cols = load_twin_columns(chunk_size)
+    timings["load_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    required = estimate_required_calories_batch(
+        cols[:, 1], cols[:, 2], cols[:, 3], cols[:, 4] == 1.0, cols[:, 5]
+    )
+    timings["compute_seconds"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ids = cols[:, 0].astype(np.int64).tolist()
+    values = required.tolist()
+    for i in range(0, len(ids), chunk_size):
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                _UPSERT_SQL,
+                [(twin_id, day, r, -r) for twin_id, r in zip(ids[i:i + chunk_size], values[i:i + chunk_size])],
+            )
+    timings["upsert_seconds"] = time.perf_counter() - started
+
+    # today's rows now carry the requirement; drop memoized values so a
+    # changed formula never outlives the batch in this process
+    clear_required_calories_cache()
+    return {
+        "date": day,
+        "twins": len(ids),
+        **{k: round(v, 4) for k, v in timings.items()},
+    }
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Store today's required calories for every twin.")
+    parser.add_argument("--date", type=date.fromisoformat, default=None,
+                        help="day to compute (YYYY-MM-DD, default: today)")
+    parser.add_argument("--chunk-size", type=int, default=BATCH_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    print(json.dumps(run_required_calories_batch(args.date, chunk_size=args.chunk_size), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,280 @@
+# app/nutrition/food_catalog.py
+"""
+Food catalog: the `food_catalog` table is the source of truth for foods
+and their per-unit nutrition. It is seeded from FOOD_DB and can be bulk
+loaded from CSV / JSONL.
+
+Each process keeps an immutable CatalogSnapshot (names in id order, the
+per-unit matrix, sorted arrays for prefix search). It is rebuilt when the
+table's (row count, last update) signature changes, checked at most every
+CATALOG_POLL_SECONDS. Food positions in id order are stable, which the
+food ML model uses as its food index.
+"""
+
+import re
+import csv
+import json
+import time
+import threading
+from bisect import bisect_left
+from datetime import datetime
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import select, func
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from app.database.db import Base, engine
+from app.nutrition.nutrition_models import FoodCatalogItem
+
+CATALOG_POLL_SECONDS = 1.0
+CATALOG_CHUNK_SIZE = 1000
+SEARCH_LIMIT = 10
+
+# -----------------------------
+#  SEED: SIMPLE INDIAN BREAKFAST DB
+# -----------------------------
+# calories / protein / carbs / fat per "unit" (approx)
+FOOD_DB: Dict[str, Dict[str, float]] = {
+    "idli":           {"cal": 70,  "p": 2.0, "c": 12.0, "f": 0.5},
+    "dosa":           {"cal": 130, "p": 3.0, "c": 20.0, "f": 4.0},
+    "poha":           {"cal": 180, "p": 4.0, "c": 30.0, "f": 5.0},
+    "upma":           {"cal": 200, "p": 5.0, "c": 28.0, "f": 7.0},
+    "aloo_paratha":   {"cal": 220, "p": 5.0, "c": 30.0, "f": 9.0},
+    "chai":           {"cal": 80,  "p": 2.0, "c": 10.0, "f": 3.0},
+    "coffee":         {"cal": 60,  "p": 2.0, "c": 6.0,  "f": 2.0},
+    "bread_slice":    {"cal": 75,  "p": 2.5, "c": 14.0, "f": 1.0},
+    "omelette":       {"cal": 120, "p": 8.0, "c": 1.0,  "f": 9.0},
+    "curd_bowl":      {"cal": 90,  "p": 5.0, "c": 4.0,  "f": 5.0},
+    "paratha_plain":  {"cal": 190, "p": 4.0, "c": 28.0, "f": 7.0},
+    "banana":         {"cal": 100, "p": 1.2, "c": 25.0, "f": 0.3},
+}
+
+NUTRIENT_COLUMNS = ("calories", "protein", "carbs", "fat")
+# accepted spellings in uploads (FOOD_DB uses the short ones)
+_ALIASES = {"cal": "calories", "kcal": "calories", "p": "protein", "c": "carbs", "f": "fat"}
+
+_NON_ALNUM = re.compile(r"[^a-z0-9]+")
+
+
+def normalize_food_name(name: str) -> str:
+    """'  Aloo-Paratha ' -> 'aloo_paratha' (the catalog key format)."""
+    return _NON_ALNUM.sub(" ", (name or "").lower()).strip().replace(" ", "_")
+
+
+# -----------------------------
+#  SNAPSHOT + PREFIX SEARCH
+# -----------------------------
+
+class CatalogSnapshot:
+    def __init__(self, rows, signature):
+        self.signature = signature
+        self.ids = [r.id for r in rows]
+        self.names = [r.name for r in rows]
+        self.display_names = [r.display_name or r.name for r in rows]
+        self.units = [r.unit for r in rows]
+        self.per_unit = np.array(
+            [[np.nan if getattr(r, c) is None else getattr(r, c) for c in NUTRIENT_COLUMNS] for r in rows],
+            dtype=float,
+        ).reshape(-1, len(NUTRIENT_COLUMNS))
+        # name -> position (the food ML model's food index)
+        self.index = {name: pos for pos, name in enumerate(self.names)}
+
+        # whole names, sorted, for "starts with" lookups
+        order = sorted(range(len(self.names)), key=self.names.__getitem__)
+        self._keys = [self.names[i] for i in order]
+        self._key_pos = order
+
+        # every later word of a name ("paratha" of "aloo_paratha"), sorted
+        words = sorted(
+            (name[m.end():], pos)
+            for pos, name in enumerate(self.names)
+            for m in re.finditer(r"_(?=[a-z0-9])", name)
+        )
+        self._words = [w for w, _ in words]
+        self._word_pos = [pos for _, pos in words]
+
+    def _prefix_range(self, keys: List[str], prefix: str) -> Iterator[int]:
+        i = bisect_left(keys, prefix)
+        while i < len(keys) and keys[i].startswith(prefix):
+            yield i
+            i += 1
+
+    def search(self, query: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+        """Names starting with `query` first, then names with a later word starting with it."""
+        prefix = normalize_food_name(query)
+        if not prefix or limit <= 0:
+            return []
+
+        found: List[int] = []
+        seen = set()
+        for keys, positions in ((self._keys, self._key_pos), (self._words, self._word_pos)):
+            for i in self._prefix_range(keys, prefix):
+                pos = positions[i]
+                if pos not in seen:
+                    seen.add(pos)
+                    found.append(pos)
+                    if len(found) >= limit:
+                        break
+            if len(found) >= limit:
+                break
+
+        return [self.describe(pos) for pos in found]
+
+    def describe(self, pos: int) -> Dict:
+        values = self.per_unit[pos]
+        return {
+            "id": self.ids[pos],
+            "name": self.names[pos],
+            "display_name": self.display_names[pos],
+            "unit": self.units[pos],
+            **{c: (None if np.isnan(v) else float(v)) for c, v in zip(NUTRIENT_COLUMNS, values)},
+        }
+
+
+_lock = threading.Lock()
+_ready = False
+_snapshot: Optional[CatalogSnapshot] = None
+_checked_at = 0.0
+
+
+def _signature(conn) -> Tuple:
+    return tuple(conn.execute(
+        select(func.count(FoodCatalogItem.id), func.max(FoodCatalogItem.updated_at))
+    ).one())
+
+
+def _ensure_catalog():
+    """Create the table and seed it from FOOD_DB the first time."""
+    global _ready
+    if _ready:
+        return
+    Base.metadata.create_all(bind=engine, tables=[FoodCatalogItem.__table__])
+    now = datetime.utcnow()
+    with engine.begin() as conn:
+        if not conn.execute(select(func.count(FoodCatalogItem.id))).scalar():
+            # insert-or-ignore: another worker may be seeding concurrently
+            conn.execute(
+                sqlite_insert(FoodCatalogItem).on_conflict_do_nothing(index_elements=["name"]),
+                [
+                    {
+                        "name": name, "display_name": name.replace("_", " "),
+                        "calories": v["cal"], "protein": v["p"], "carbs": v["c"], "fat": v["f"],
+                        "source": "seed", "updated_at": now,
+                    }
+                    for name, v in FOOD_DB.items()
+                ],
+            )
+    _ready = True
+
+
+def get_catalog() -> CatalogSnapshot:
+    global _snapshot, _checked_at
+    now = time.monotonic()
+    snap = _snapshot
+    if snap is not None and now - _checked_at < CATALOG_POLL_SECONDS:
+        return snap
+
+    with _lock:
+        _ensure_catalog()
+        with engine.connect() as conn:
+            signature = _signature(conn)
+            if _snapshot is None or _snapshot.signature != signature:
+                rows = conn.execute(
+                    select(FoodCatalogItem.__table__).order_by(FoodCatalogItem.id)
+                ).all()
+                _snapshot = CatalogSnapshot(rows, signature)
+        _checked_at = now
+        return _snapshot
+
+
+def invalidate_catalog():
+    global _checked_at
+    _checked_at = 0.0
+
+
+def search_foods(query: str, limit: int = SEARCH_LIMIT) -> List[Dict]:
+    return get_catalog().search(query, limit=limit)
+
+
+# -----------------------------
+#  BULK LOAD (CSV / JSONL)
+# -----------------------------
+
+def _parse_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    """(line number, dict for CSV / raw line for JSONL), decoded lazily."""
+    if fmt == "csv":
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+    elif fmt == "jsonl":
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_no, line
+    else:
+        raise ValueError(f"Unsupported catalog format: {fmt}")
+
+
+def _catalog_row(raw, now: datetime) -> Dict:
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    fields = {_ALIASES.get(k.strip().lower(), k.strip().lower()): v for k, v in raw.items() if k}
+    name = normalize_food_name(fields.get("name", ""))
+    if not name:
+        raise ValueError("missing name")
+
+    row = {
+        "name": name,
+        "display_name": (fields.get("display_name") or fields["name"]).strip(),
+        "unit": (fields.get("unit") or None),
+        "source": "upload",
+        "updated_at": now,
+    }
+    for col in NUTRIENT_COLUMNS:
+        value = fields.get(col)
+        row[col] = None if value in (None, "") else float(value)
+        if row[col] is not None and row[col] < 0:
+            raise ValueError(f"negative {col}")
+    return row
+
+
+def _upsert_chunk(conn, rows: List[Dict]):
+    stmt = sqlite_insert(FoodCatalogItem)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["name"],
+        set_={c: stmt.excluded[c] for c in ("display_name", "unit", *NUTRIENT_COLUMNS, "source", "updated_at")},
+    )
+    conn.execute(stmt, rows)
+
+
+def load_catalog(stream: IO[str], fmt: str, chunk_size: int = CATALOG_CHUNK_SIZE) -> Dict:
+    """
+    Stream CSV (header: name, calories, protein, carbs, fat[, unit, display_name])
+    or JSONL rows into the catalog, upserting by normalized name in chunked
+    transactions. Bad rows are reported and skipped.
+    """
+    _ensure_catalog()
+    now = datetime.utcnow()
+    upserted, errors, chunk = 0, [], {}
+
+    def flush():
+        nonlocal upserted
+        if chunk:
+            with engine.begin() as conn:
+                _upsert_chunk(conn, list(chunk.values()))
+            upserted += len(chunk)
+            chunk.clear()
+
+    for line_no, raw in _parse_rows(stream, fmt):
+        try:
+            row = _catalog_row(raw, now)
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append({"line": line_no, "error": str(e)})
+            continue
+        # last occurrence of a name in the upload wins
+        chunk[row["name"]] = row
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+
+    invalidate_catalog()
+    return {"upserted": upserted, "errors": errors, "catalog_size": len(get_catalog().names)}
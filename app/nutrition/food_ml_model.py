@@ -1,12 +1,11 @@
 # app/nutrition/food_ml_model.py
 import os
-import json
+import time
+import threading
 from datetime import datetime
-from typing import List, Dict, Optional, Tuple
+from typing import Callable, List, Dict, Optional, Tuple
 
 import numpy as np
-import mlflow
-import mlflow.sklearn
 
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.multioutput import MultiOutputRegressor
@@ -15,62 +14,42 @@ from sklearn.metrics import mean_absolute_error
 
 from joblib import dump, load
 
+from app.ml import model_registry
+from app.nutrition.food_catalog import get_catalog, normalize_food_name
+from app.ml.retention import prune_after_run
+from app.ml.tracking import tracker
+from app.ml.training_jobs import JobConflictError, submit_retrain_job, get_job
+
 # Directory for food models (separate from alert models)
 FOOD_MODELS_DIR = "models_food"
+# legacy JSON registry, imported into the DB registry on first use
 FOOD_META_PATH = os.path.join(FOOD_MODELS_DIR, "food_models_meta.json")
 
-# -----------------------------
-#  SIMPLE INDIAN BREAKFAST DB
-# -----------------------------
-# calories / protein / carbs / fat per "unit" (approx)
-FOOD_DB: Dict[str, Dict[str, float]] = {
-    "idli":           {"cal": 70,  "p": 2.0, "c": 12.0, "f": 0.5},
-    "dosa":           {"cal": 130, "p": 3.0, "c": 20.0, "f": 4.0},
-    "poha":           {"cal": 180, "p": 4.0, "c": 30.0, "f": 5.0},
-    "upma":           {"cal": 200, "p": 5.0, "c": 28.0, "f": 7.0},
-    "aloo_paratha":   {"cal": 220, "p": 5.0, "c": 30.0, "f": 9.0},
-    "chai":           {"cal": 80,  "p": 2.0, "c": 10.0, "f": 3.0},
-    "coffee":         {"cal": 60,  "p": 2.0, "c": 6.0,  "f": 2.0},
-    "bread_slice":    {"cal": 75,  "p": 2.5, "c": 14.0, "f": 1.0},
-    "omelette":       {"cal": 120, "p": 8.0, "c": 1.0,  "f": 9.0},
-    "curd_bowl":      {"cal": 90,  "p": 5.0, "c": 4.0,  "f": 5.0},
-    "paratha_plain":  {"cal": 190, "p": 4.0, "c": 28.0, "f": 7.0},
-    "banana":         {"cal": 100, "p": 1.2, "c": 25.0, "f": 0.3},
-}
-
-FOOD_INDEX = {name: idx for idx, name in enumerate(FOOD_DB.keys())}
+# Foods (seeded from FOOD_DB) live in the food catalog table; a food's
+# model index is its position in catalog id order, which is stable.
 
 
-def _ensure_food_dirs():
-    os.makedirs(FOOD_MODELS_DIR, exist_ok=True)
-    if not os.path.exists(FOOD_META_PATH):
-        with open(FOOD_META_PATH, "w") as f:
-            json.dump({"models": []}, f, indent=2)
+def get_food_index() -> Dict[str, int]:
+    return get_catalog().index
 
 
-def _load_food_meta() -> Dict:
-    _ensure_food_dirs()
-    with open(FOOD_META_PATH, "r") as f:
-        return json.load(f)
+FOOD_FAMILY = "food"
+FOOD_EXPERIMENT = "bodytwin_food_models"
 
 
-def _save_food_meta(meta: Dict):
-    with open(FOOD_META_PATH, "w") as f:
-        json.dump(meta, f, indent=2)
+def _ensure_food_dirs():
+    os.makedirs(FOOD_MODELS_DIR, exist_ok=True)
+    model_registry.ensure_family(FOOD_FAMILY, legacy_meta_path=FOOD_META_PATH)
 
 
 def get_active_food_model_path() -> Optional[str]:
-    meta = _load_food_meta()
-    models = meta.get("models", [])
-    active = [m for m in models if m.get("active")]
-    if not active:
-        return None
-    return active[-1]["path"]
+    model_registry.ensure_family(FOOD_FAMILY, legacy_meta_path=FOOD_META_PATH)
+    return model_registry.get_active_path(FOOD_FAMILY)
 
 
 def get_registered_food_models() -> List[Dict]:
-    meta = _load_food_meta()
-    return meta.get("models", [])
+    model_registry.ensure_family(FOOD_FAMILY, legacy_meta_path=FOOD_META_PATH)
+    return model_registry.get_models(FOOD_FAMILY)
 
 
 # -----------------------------
@@ -79,36 +58,31 @@ def get_registered_food_models() -> List[Dict]:
 
 def _generate_food_training_data() -> Tuple[np.ndarray, np.ndarray]:
     """
-    Build synthetic training data from FOOD_DB.
+    Build synthetic training data from the food catalog (foods with
+    known per-unit values).
     Features: [food_idx, quantity]
     Targets: [calories, protein, carbs, fat]
     """
-    X = []
-    y = []
-
-    for name, idx in FOOD_INDEX.items():
-        base = FOOD_DB[name]
-        for qty in [0.5, 1.0, 1.5, 2.0, 3.0]:
-            X.append([idx, qty])
-            y.append([
-                base["cal"] * qty,
-                base["p"] * qty,
-                base["c"] * qty,
-                base["f"] * qty,
-            ])
+    per_unit = get_catalog().per_unit
+    known = np.flatnonzero(~np.isnan(per_unit).any(axis=1))
+    qtys = np.array([0.5, 1.0, 1.5, 2.0, 3.0])
 
-    return np.array(X), np.array(y)
+    idx = np.repeat(known, len(qtys))
+    qty = np.tile(qtys, len(known))
+    return np.column_stack([idx, qty]), per_unit[idx] * qty[:, None]
 
 
 # -----------------------------
 #  MLOPS RETRAIN FOR FOOD MODEL
 # -----------------------------
 
-def retrain_food_model() -> Dict:
+def retrain_food_model(progress: Optional[Callable[[str, Dict], None]] = None) -> Dict:
     """
     Train a MultiOutputRegressor on synthetic Indian breakfast data.
-    Logged to MLflow & best model promoted via meta.
+    Logged to MLflow & promoted in the model registry.
+    `progress(candidate, update)` is called when training starts and ends.
     """
+    report = progress or (lambda candidate, update: None)
 
     _ensure_food_dirs()
 
@@ -117,44 +91,52 @@ def retrain_food_model() -> Dict:
         X, y, test_size=0.25, random_state=42
     )
 
-    mlflow.set_experiment("bodytwin_food_models")
-
-    with mlflow.start_run(run_name="food_calorie_model") as run:
+    with tracker.start_run(FOOD_EXPERIMENT, run_name="food_calorie_model") as run:
         base = RandomForestRegressor(n_estimators=200, random_state=42)
         model = MultiOutputRegressor(base)
+
+        report("rf_multioutput", {"status": "running"})
+        started = time.perf_counter()
         model.fit(X_train, y_train)
+        train_seconds = round(time.perf_counter() - started, 3)
 
         preds = model.predict(X_test)
         mae = float(mean_absolute_error(y_test, preds))
 
-        mlflow.log_metric("mae", mae)
-        mlflow.log_param("base_model", "RandomForestRegressor")
-        mlflow.log_param("n_foods", len(FOOD_DB))
+        run.log_metric("mae", mae)
+        run.log_metric("train_seconds", train_seconds)
+        run.log_param("base_model", "RandomForestRegressor")
+        run.log_param("n_foods", len(get_catalog().names))
 
         timestamp = datetime.utcnow().strftime("%Y%m%d-%H%M%S")
         model_path = os.path.join(FOOD_MODELS_DIR, f"food_model_{timestamp}.joblib")
         dump(model, model_path)
-        mlflow.sklearn.log_model(model, artifact_path="food_model")
+        # the registry file is the only serialized copy; the run points at it
+        run.set_tag("model_path", model_path)
 
-        meta = _load_food_meta()
-        for m in meta.get("models", []):
-            m["active"] = False
-
-        meta.setdefault("models", []).append({
+        model_registry.register_model(FOOD_FAMILY, {
             "name": os.path.basename(model_path),
             "path": model_path,
             "mae": mae,
-            "mlflow_run_id": run.info.run_id,
+            "mlflow_run_id": run.run_id,
             "created_at": datetime.utcnow().isoformat(),
-            "active": True,
         })
-        _save_food_meta(meta)
+        _food_model.swap(model, model_path)
+        retention = prune_after_run(FOOD_FAMILY)
+
+        report("rf_multioutput", {
+            "status": "done",
+            "mae": mae,
+            "train_seconds": train_seconds,
+            "model_path": model_path,
+        })
 
         return {
             "status": "trained_food_model",
             "mae": mae,
             "model_path": model_path,
-            "mlflow_run_id": run.info.run_id,
+            "mlflow_run_id": run.run_id,
+            "retention": retention,
         }
 
 
@@ -162,47 +144,140 @@ def retrain_food_model() -> Dict:
 #  PREDICTION HELPER
 # -----------------------------
 
-def _load_active_food_model():
-    path = get_active_food_model_path()
-    if not path or not os.path.exists(path):
-        # If no model yet, train one once
-        info = retrain_food_model()
-        path = info["model_path"]
-    return load(path)
-
+FOOD_TRAIN_RETRY_SECONDS = 60.0
 
-def predict_meal_nutrition(items: List[Dict[str, float]]) -> Dict[str, float]:
+class _FoodModelHolder:
     """
-    items: [{ "name": "idli", "quantity": 2 }, ...]
-    Returns summed calories, protein, carbs, fat.
+    Process-wide holder for the active food model, loaded once (at app
+    startup via warm_food_model) and reloaded only when the registry
+    promotes another model.
+
+    When no model is registered yet, training is started once in the
+    background (training_jobs' per-family lock keeps it single-flight
+    across workers) and get() returns None so callers can fall back to
+    exact catalog arithmetic instead of blocking on training.
     """
-    model = _load_active_food_model()
 
-    total_cal = 0.0
-    total_p = 0.0
-    total_c = 0.0
-    total_f = 0.0
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (model, path) swapped as a single tuple
+        self._state = (None, None)
+        self._training_job_id = None
+        self._training_submitted_at = 0.0
+
+    def get(self):
+        path = get_active_food_model_path()
+        model, loaded_path = self._state
+        if model is not None and loaded_path == path:
+            return model
+
+        if not path or not os.path.exists(path):
+            self._start_background_training()
+            return None
+
+        with self._lock:
+            model, loaded_path = self._state
+            if model is None or loaded_path != path:
+                model = load(path)
+                self._state = (model, path)
+            return model
+
+    def swap(self, model, path: str):
+        """Install a freshly trained model without reloading it from disk."""
+        with self._lock:
+            self._state = (model, path)
+
+    def _start_background_training(self):
+        with self._lock:
+            if self._training_job_id:
+                job = get_job(self._training_job_id)
+                if job and job["status"] in ("queued", "running"):
+                    return
+                if time.monotonic() - self._training_submitted_at < FOOD_TRAIN_RETRY_SECONDS:
+                    return
+
+            self._training_submitted_at = time.monotonic()
+            try:
+                job = submit_retrain_job(FOOD_FAMILY, retrain_food_model)
+                self._training_job_id = job["job_id"]
+            except JobConflictError:
+                # another worker is already training it
+                self._training_job_id = None
+
+    def training_job_id(self) -> Optional[str]:
+        return self._training_job_id
+
+
+_food_model = _FoodModelHolder()
+
+
+def get_active_food_model():
+    """The resident food model, or None while the first one is being trained."""
+    return _food_model.get()
+
+
+def warm_food_model():
+    """Load the food model at startup (or start training it in the background)."""
+    _ensure_food_dirs()
+    return _food_model.get()
 
-    for item in items:
-        raw_name = item.get("name", "").strip().lower().replace(" ", "_")
-        qty = float(item.get("quantity", 1.0))
 
-        if raw_name not in FOOD_INDEX:
-            # Unknown food → skip or assume 0; you can log warning
+def _resolve_items(items: List[Dict[str, float]]) -> np.ndarray:
+    """Model feature rows [food_idx, quantity] for the known, priced items of a meal."""
+    catalog = get_catalog()
+    food_index = catalog.index
+    unpriced = np.isnan(catalog.per_unit).any(axis=1)
+    rows = []
+    for item in items:
+        raw_name = normalize_food_name(item.get("name", ""))
+        if raw_name not in food_index or unpriced[food_index[raw_name]]:
+            # Unknown food, or one the model never saw values for → skip
             continue
+        rows.append((food_index[raw_name], float(item.get("quantity", 1.0))))
 
-        idx = FOOD_INDEX[raw_name]
-        X = np.array([[idx, qty]])
-        cal, p, c, f = model.predict(X)[0]
+    return np.asarray(rows, dtype=float).reshape(-1, 2)
 
-        total_cal += cal
-        total_p += p
-        total_c += c
-        total_f += f
 
+def _nutrition_dict(totals: np.ndarray) -> Dict[str, float]:
+    cal, p, c, f = totals
     return {
-        "calories": float(total_cal),
-        "protein": float(total_p),
-        "carbs": float(total_c),
-        "fat": float(total_f),
+        "calories": float(cal),
+        "protein": float(p),
+        "carbs": float(c),
+        "fat": float(f),
     }
+
+
+def predict_meal_nutrition(items: List[Dict[str, float]]) -> Dict[str, float]:
+    """
+    items: [{ "name": "idli", "quantity": 2 }, ...]
+    Returns summed calories, protein, carbs, fat.
+    All known items are predicted in one call over an (n_items, 2) matrix.
+    """
+    return predict_meals_nutrition([items])[0]
+
+
+def predict_meals_nutrition(meals: List[List[Dict[str, float]]]) -> List[Dict[str, float]]:
+    """
+    Batch version of predict_meal_nutrition for imports / backfills:
+    the items of every meal go through a single model.predict call.
+    """
+    meal_ids, rows = [], []
+    for meal_id, items in enumerate(meals):
+        X = _resolve_items(items)
+        meal_ids.append(np.full(len(X), meal_id))
+        rows.append(X)
+
+    totals = np.zeros((len(meals), 4))
+    X = np.concatenate(rows) if rows else np.empty((0, 2))
+    if len(X):
+        model = get_active_food_model()
+        if model is not None:
+            preds = model.predict(X)
+        else:
+            # no model yet: the exact per-unit values it is trained on
+            per_unit = np.nan_to_num(get_catalog().per_unit)
+            preds = per_unit[X[:, 0].astype(int)] * X[:, 1:2]
+        np.add.at(totals, np.concatenate(meal_ids), preds)
+
+    return [_nutrition_dict(t) for t in totals]
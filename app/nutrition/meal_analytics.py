@@ -0,0 +1,158 @@
+# app/nutrition/meal_analytics.py
+"""
+Per-food analytics over the normalized meal_items table.
+
+Every question here is one GROUP BY over meal_items (twin_id and date are
+stored on each item, so the (food_id, date) and (twin_id, date) indexes
+cover the common filters); twins are joined only to filter by city and
+the catalog only to name the result rows.
+
+Meals logged before meal_items existed only have their food_json; fill
+their items in once with:
+
+    python -m app.nutrition.meal_analytics backfill
+"""
+
+import json
+import argparse
+from datetime import date
+from typing import Dict, List, Optional
+
+from sqlalchemy import exists, func, insert, select
+from sqlalchemy.orm import Session
+
+from app.database.db import Base, SessionLocal, engine
+from app.database.twin_schema import Twin
+from app.nutrition.nutrition_models import FoodCatalogItem, MealItemLog, MealLog
+from app.nutrition.nutrition_engine import compute_meals_nutrition
+from app.nutrition.nutrition_service import meal_item_rows
+
+METRICS = ("calories", "protein", "carbs", "fat", "quantity")
+ANALYTICS_MAX_ROWS = 500
+BACKFILL_BATCH_SIZE = 2000
+
+
+# -----------------------------
+#  AGGREGATES
+# -----------------------------
+
+def food_totals(
+    db: Session,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    city: Optional[str] = None,
+    twin_id: Optional[int] = None,
+    food_id: Optional[int] = None,
+    by_twin: bool = False,
+    metric: str = "calories",
+    limit: int = 10,
+) -> List[Dict]:
+    """
+    Summed quantity and nutrition per food (per twin and food with
+    `by_twin`), largest `metric` first. Unrecognised items (no food_id)
+    are left out.
+    """
+    if metric not in METRICS:
+        raise ValueError(f"metric must be one of {', '.join(METRICS)}")
+    limit = max(1, min(limit, ANALYTICS_MAX_ROWS))
+
+    sums = {m: func.sum(getattr(MealItemLog, m)).label(m) for m in METRICS}
+    keys = [MealItemLog.twin_id, MealItemLog.food_id] if by_twin else [MealItemLog.food_id]
+    grouped = (
+        select(*keys, func.count(func.distinct(MealItemLog.meal_id)).label("meals"), *sums.values())
+        .where(MealItemLog.food_id.is_not(None))
+        .group_by(*keys)
+    )
+    if date_from is not None:
+        grouped = grouped.where(MealItemLog.date >= date_from)
+    if date_to is not None:
+        grouped = grouped.where(MealItemLog.date <= date_to)
+    if twin_id is not None:
+        grouped = grouped.where(MealItemLog.twin_id == twin_id)
+    if food_id is not None:
+        grouped = grouped.where(MealItemLog.food_id == food_id)
+    if city:
+        grouped = grouped.join(Twin, Twin.id == MealItemLog.twin_id).where(
+            func.lower(Twin.city) == city.strip().lower()
+        )
+    grouped = grouped.order_by(sums[metric].desc()).limit(limit).subquery()
+
+    # name only the rows that made the cut
+    stmt = (
+        select(grouped, FoodCatalogItem.name, FoodCatalogItem.display_name)
+        .join(FoodCatalogItem, FoodCatalogItem.id == grouped.c.food_id)
+        .order_by(grouped.c[metric].desc())
+    )
+    return [
+        {**row, **{m: round(float(row[m] or 0.0), 3) for m in METRICS}}
+        for row in db.execute(stmt).mappings()
+    ]
+
+
+# -----------------------------
+#  BACKFILL
+# -----------------------------
+
+def backfill_meal_items(db: Session, batch_size: int = BACKFILL_BATCH_SIZE) -> Dict:
+    """
+    Write meal_items for meals that have none, pricing their food_json with
+    the current catalog (as the meal would be priced if logged today).
+    Batches are committed one by one, so the backfill can be interrupted
+    and re-run.
+    """
+    has_items = exists().where(MealItemLog.meal_id == MealLog.id)
+    meals = items = 0
+    last_id = 0
+    while True:
+        batch = db.execute(
+            select(MealLog.id, MealLog.twin_id, MealLog.date, MealLog.food_json)
+            .where(MealLog.id > last_id, ~has_items)
+            .order_by(MealLog.id)
+            .limit(batch_size)
+        ).all()
+        if not batch:
+            break
+        last_id = batch[-1].id
+
+        contents = []
+        for meal in batch:
+            raw = meal.food_json
+            if isinstance(raw, str):  # double-encoded legacy rows
+                try:
+                    raw = json.loads(raw)
+                except ValueError:
+                    raw = []
+            contents.append([i for i in raw if isinstance(i, dict)] if isinstance(raw, list) else [])
+
+        rows = [
+            item
+            for meal, n in zip(batch, compute_meals_nutrition(contents))
+            for item in meal_item_rows(meal.id, meal.twin_id, meal.date, n["items"])
+        ]
+        if rows:
+            db.execute(insert(MealItemLog.__table__), rows)
+        db.commit()
+        meals += len(batch)
+        items += len(rows)
+
+    return {"meals_scanned": meals, "items_written": items}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Meal item analytics maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    backfill = sub.add_parser("backfill", help="write meal_items for meals logged before the table existed")
+    backfill.add_argument("--batch-size", type=int, default=BACKFILL_BATCH_SIZE)
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(bind=engine, tables=[MealItemLog.__table__])
+
+    db = SessionLocal()
+    try:
+        print(json.dumps(backfill_meal_items(db, batch_size=args.batch_size), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
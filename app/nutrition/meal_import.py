@@ -0,0 +1,221 @@
+# app/nutrition/meal_import.py
+"""
+Streaming bulk import of meal history (backfills from partner diet apps).
+
+Accepted rows, one meal each:
+- NDJSON: {"twin_id": 1, "date": "2025-01-31", "meal_type": "breakfast",
+           "items": [{"name": "idli", "quantity": 2}, ...]}
+- CSV:    twin_id,date,meal_type,items  where items is either a JSON list
+          or "idli:2;chai:1"
+
+Rows are parsed lazily and handled in chunks: nutrition for the whole
+chunk is computed in one batch, and the MealLog rows, their meal_items
+and the weekly / monthly rollup increments go in with bulk statements in
+one transaction per chunk. Every affected DailyCalorieSummary is
+recomputed once per (twin, date) at the end. Bad rows are reported with
+their line number and skipped; they never abort the upload.
+"""
+
+import csv
+import json
+from datetime import date, datetime
+from typing import IO, Dict, Iterator, List, Set, Tuple
+
+from sqlalchemy import insert, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.database.twin_schema import Twin
+from app.nutrition.nutrition_models import DailyCalorieSummary, MealLog, MealItemLog
+from app.nutrition.nutrition_engine import compute_meals_nutrition
+from app.nutrition.nutrition_rollups import meal_rollup_entry, update_rollups
+from app.nutrition.nutrition_service import (
+    meal_item_rows,
+    required_calories,
+    recompute_daily_summaries,
+)
+
+IMPORT_CHUNK_SIZE = 2000
+MAX_REPORTED_ERRORS = 1000
+
+
+def _iter_raw_rows(stream: IO[str], fmt: str) -> Iterator[Tuple[int, object]]:
+    if fmt == "csv":
+        for line_no, row in enumerate(csv.DictReader(stream), start=2):
+            yield line_no, row
+    elif fmt in ("ndjson", "jsonl"):
+        for line_no, line in enumerate(stream, start=1):
+            if line.strip():
+                yield line_no, line
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+
+
+def _parse_items(raw) -> List[Dict]:
+    if isinstance(raw, str):
+        raw = raw.strip()
+        if raw.startswith("["):
+            raw = json.loads(raw)
+        else:
+            # "idli:2;chai:1"
+            raw = [
+                {"name": name, "quantity": qty or 1.0}
+                for name, _, qty in (part.partition(":") for part in raw.split(";") if part.strip())
+            ]
+    if not isinstance(raw, list) or not raw:
+        raise ValueError("items must be a non-empty list")
+
+    items = []
+    for item in raw:
+        name = str(item["name"]).strip()
+        quantity = float(item.get("quantity", 1.0))
+        if not name:
+            raise ValueError("item without a name")
+        if quantity <= 0:
+            raise ValueError(f"non-positive quantity for {name}")
+        items.append({"name": name, "quantity": quantity})
+    return items
+
+
+def _parse_row(raw) -> Dict:
+    if isinstance(raw, str):
+        raw = json.loads(raw)
+    if not isinstance(raw, dict):
+        raise ValueError("row must be an object")
+
+    meal_type = str(raw.get("meal_type") or "").strip()
+    if not meal_type:
+        raise ValueError("missing meal_type")
+
+    day = raw.get("date")
+    return {
+        "twin_id": int(raw["twin_id"]),
+        "date": date.fromisoformat(str(day).strip()) if day else date.today(),
+        "meal_type": meal_type,
+        "items": _parse_items(raw.get("items")),
+    }
+
+
+def _chunks(stream: IO[str], fmt: str, chunk_size: int, errors: List[Dict]) -> Iterator[List[Tuple[int, Dict]]]:
+    chunk = []
+    for line_no, raw in _iter_raw_rows(stream, fmt):
+        try:
+            chunk.append((line_no, _parse_row(raw)))
+        except (ValueError, TypeError, KeyError, AttributeError) as e:
+            errors.append({"line": line_no, "error": f"{type(e).__name__}: {e}"})
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _new_days(db: Session, keys: Set[Tuple[int, date]], twin_required: Dict[int, float]) -> Dict[Tuple[int, date], float]:
+    """
+    The (twin, date) keys without any logged meal yet, with the required
+    calories their daily summary has or will get.
+    """
+    keys = list(keys)
+    logged = set(
+        db.execute(
+            select(MealLog.twin_id, MealLog.date)
+            .where(tuple_(MealLog.twin_id, MealLog.date).in_(keys))
+            .distinct()
+        ).tuples()
+    )
+    new = [key for key in keys if key not in logged]
+    if not new:
+        return {}
+    stored = dict(
+        ((twin_id, day), required)
+        for twin_id, day, required in db.execute(
+            select(DailyCalorieSummary.twin_id, DailyCalorieSummary.date, DailyCalorieSummary.required_calories)
+            .where(tuple_(DailyCalorieSummary.twin_id, DailyCalorieSummary.date).in_(new))
+        )
+    )
+    return {key: stored.get(key) or twin_required[key[0]] for key in new}
+
+
+def import_meals(
+    db: Session,
+    stream: IO[str],
+    fmt: str,
+    chunk_size: int = IMPORT_CHUNK_SIZE,
+) -> Dict:
+    errors: List[Dict] = []
+    twin_required: Dict[int, float] = {}
+    affected: Set[Tuple[int, date]] = set()
+    imported = 0
+    unresolved_items = unpriced_items = 0
+
+    for chunk in _chunks(stream, fmt, chunk_size, errors):
+        # one query per chunk for twins not seen before
+        new_ids = {row["twin_id"] for _, row in chunk} - twin_required.keys()
+        if new_ids:
+            twin_required.update(
+                (t.id, required_calories(t))
+                for t in db.execute(select(Twin).where(Twin.id.in_(new_ids))).scalars()
+            )
+
+        valid = []
+        for line_no, row in chunk:
+            if row["twin_id"] in twin_required:
+                valid.append(row)
+            else:
+                errors.append({"line": line_no, "error": f"Twin {row['twin_id']} not found"})
+        if not valid:
+            continue
+
+        nutrition = compute_meals_nutrition([row["items"] for row in valid])
+        new_days = _new_days(db, {(row["twin_id"], row["date"]) for row in valid}, twin_required)
+        now = datetime.utcnow()
+        meal_ids = db.execute(insert(MealLog).returning(MealLog.id, sort_by_parameter_order=True), [
+            {
+                "twin_id": row["twin_id"],
+                "date": row["date"],
+                "meal_type": row["meal_type"],
+                "food_json": row["items"],
+                "calories": n["calories"],
+                "protein": n["protein"],
+                "carbs": n["carbs"],
+                "fat": n["fat"],
+                "created_at": now,
+            }
+            for row, n in zip(valid, nutrition)
+        ]).scalars().all()
+        item_rows = [
+            item
+            for meal_id, row, n in zip(meal_ids, valid, nutrition)
+            for item in meal_item_rows(meal_id, row["twin_id"], row["date"], n["items"])
+        ]
+        if item_rows:
+            db.execute(insert(MealItemLog.__table__), item_rows)
+        entries = []
+        for row, n in zip(valid, nutrition):
+            key = (row["twin_id"], row["date"])
+            required = new_days.pop(key, None)  # only the day's first meal counts the day
+            entries.append(meal_rollup_entry(*key, n, required is not None, required or 0.0))
+        update_rollups(db, entries)
+        db.commit()
+
+        imported += len(valid)
+        affected.update((row["twin_id"], row["date"]) for row in valid)
+        unresolved_items += sum(
+            1 for n in nutrition for item in n["items"] if item["resolved"] is None
+        )
+        unpriced_items += sum(
+            1 for n in nutrition for item in n["items"] if item["match"] == "unpriced"
+        )
+
+    summaries = recompute_daily_summaries(db, affected)
+    errors.sort(key=lambda e: e["line"])
+
+    return {
+        "imported": imported,
+        "failed": len(errors),
+        "daily_summaries_updated": summaries,
+        "unresolved_items": unresolved_items,
+        "unpriced_items": unpriced_items,
+        "errors": errors[:MAX_REPORTED_ERRORS],
+        "errors_truncated": len(errors) > MAX_REPORTED_ERRORS,
+    }
@@ -0,0 +1,180 @@
+# app/nutrition/nutrition_engine.py
+"""
+Exact nutrition engine for meal logging.
+
+Nutrition in the food catalog is linear in quantity, so a meal's totals
+are one matrix-vector product: quantities (n_items) @ per-unit values
+(n_items, 4). The engine is rebuilt whenever the catalog snapshot changes.
+
+Food names are resolved in two steps:
+- exact match on the normalized name ("Aloo Paratha" -> "aloo_paratha")
+- fuzzy match through a character-trigram index ("aloo parata"), scored
+  with the Dice coefficient and accepted from FUZZY_MIN_SCORE up
+Resolutions are memoized, so repeated names cost a dict lookup.
+
+Names that match nothing are reported back as "unknown" and contribute
+nothing, as before. Foods whose per-unit values are missing (NaN, e.g.
+uploaded without nutrients) are reported as "unpriced" and contribute
+nothing either: their catalog position carries no nutritional meaning,
+so there is nothing to estimate them from.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.nutrition.food_catalog import CatalogSnapshot, get_catalog, normalize_food_name
+
+FUZZY_MIN_SCORE = 0.5
+RESOLVE_CACHE_SIZE = 10000
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+
+def _trigrams(key: str) -> set:
+    padded = f"  {key.replace('_', ' ')} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class NutritionEngine:
+    def __init__(self, names: Sequence[str], per_unit: np.ndarray):
+        self.names = list(names)
+        self.per_unit = np.asarray(per_unit, dtype=float).reshape(-1, len(NUTRIENTS))
+        self.unpriced = np.isnan(self.per_unit).any(axis=1)
+        self._exact = {normalize_food_name(n): i for i, n in enumerate(self.names)}
+
+        # trigram -> food ids containing it
+        postings = defaultdict(list)
+        sizes = []
+        for i, name in enumerate(self.names):
+            grams = _trigrams(normalize_food_name(name))
+            sizes.append(len(grams))
+            for g in grams:
+                postings[g].append(i)
+        self._postings = {g: np.asarray(ids, dtype=np.int32) for g, ids in postings.items()}
+        self._trigram_counts = np.asarray(sizes, dtype=float)
+
+        self._resolved: Dict[str, Tuple[Optional[int], str, float]] = {}
+        self._lock = threading.Lock()
+        self.catalog: Optional[CatalogSnapshot] = None
+
+    @classmethod
+    def from_catalog(cls, catalog: CatalogSnapshot) -> "NutritionEngine":
+        engine = cls(catalog.names, catalog.per_unit)
+        engine.catalog = catalog
+        return engine
+
+    # ---- name resolution ----
+
+    def _fuzzy(self, key: str) -> Tuple[Optional[int], float]:
+        grams = _trigrams(key)
+        hits = [self._postings[g] for g in grams if g in self._postings]
+        if not hits:
+            return None, 0.0
+
+        shared = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        scores = 2.0 * shared / (len(grams) + self._trigram_counts)
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def resolve(self, name: str) -> Tuple[Optional[int], str, float]:
+        """(food id or None, "exact" / "fuzzy" / "unknown", score)."""
+        key = normalize_food_name(name)
+        cached = self._resolved.get(key)
+        if cached is not None:
+            return cached
+
+        if key in self._exact:
+            result = (self._exact[key], "exact", 1.0)
+        else:
+            food_id, score = self._fuzzy(key) if key else (None, 0.0)
+            if food_id is not None and score >= FUZZY_MIN_SCORE:
+                result = (food_id, "fuzzy", round(score, 3))
+            else:
+                result = (None, "unknown", round(score, 3))
+
+        with self._lock:
+            if len(self._resolved) >= RESOLVE_CACHE_SIZE:
+                self._resolved.clear()
+            self._resolved[key] = result
+        return result
+
+    # ---- nutrition ----
+
+    def compute_meals(self, meals: List[List[Dict]]) -> List[Dict]:
+        """
+        Totals plus per-item resolutions for many meals, with one pass of
+        array arithmetic over every priced item.
+        """
+        catalog_ids = self.catalog.ids if self.catalog is not None else None
+        meal_ids, food_ids, quantities = [], [], []
+        priced, reports = [], []
+        for meal_id, items in enumerate(meals):
+            report = []
+            for item in items:
+                qty = float(item.get("quantity", 1.0))
+                food_id, match, score = self.resolve(item.get("name", ""))
+                if food_id is not None and self.unpriced[food_id]:
+                    match = "unpriced"
+                entry = {
+                    "name": item.get("name", ""),
+                    "quantity": qty,
+                    "resolved": self.names[food_id] if food_id is not None else None,
+                    "food_id": catalog_ids[food_id] if food_id is not None and catalog_ids else None,
+                    "match": match,
+                    "score": score,
+                    **dict.fromkeys(NUTRIENTS, 0.0),
+                }
+                report.append(entry)
+                if food_id is not None and match != "unpriced":
+                    meal_ids.append(meal_id)
+                    food_ids.append(food_id)
+                    quantities.append(qty)
+                    priced.append(entry)
+            reports.append(report)
+
+        totals = np.zeros((len(meals), len(NUTRIENTS)))
+        if food_ids:
+            values = self.per_unit[np.asarray(food_ids)] * np.asarray(quantities, dtype=float)[:, None]
+            np.add.at(totals, np.asarray(meal_ids), values)
+            for entry, row in zip(priced, values.tolist()):
+                entry.update(zip(NUTRIENTS, row))
+
+        return [
+            {**dict(zip(NUTRIENTS, map(float, t))), "items": report}
+            for t, report in zip(totals, reports)
+        ]
+
+    def compute_meal(self, items: List[Dict]) -> Dict:
+        return self.compute_meals([items])[0]
+
+
+_engine: Optional[NutritionEngine] = None
+_engine_lock = threading.Lock()
+
+
+def get_nutrition_engine() -> NutritionEngine:
+    """The engine for the current catalog snapshot (rebuilt on change)."""
+    global _engine
+    catalog = get_catalog()
+    engine = _engine
+    if engine is None or engine.catalog is not catalog:
+        with _engine_lock:
+            if _engine is None or _engine.catalog is not catalog:
+                _engine = NutritionEngine.from_catalog(catalog)
+            engine = _engine
+    return engine
+
+
+def compute_meal_nutrition(items: List[Dict]) -> Dict:
+    """
+    items: [{ "name": "idli", "quantity": 2 }, ...]
+    Returns summed calories / protein / carbs / fat and, under "items",
+    how each name was resolved ("exact" / "fuzzy" / "unknown" / "unpriced").
+    """
+    return get_nutrition_engine().compute_meal(items)
+
+
+def compute_meals_nutrition(meals: List[List[Dict]]) -> List[Dict]:
+    return get_nutrition_engine().compute_meals(meals)
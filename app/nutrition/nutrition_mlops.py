@@ -1,15 +1,16 @@
 # app/nutrition/nutrition_mlops.py
-from typing import Dict, List
+from typing import Callable, Dict, List, Optional
 
 from app.nutrition.food_ml_model import (
     retrain_food_model,
     get_registered_food_models,
     get_active_food_model_path,
+    _food_model,
 )
 
 
-def retrain_food_mlops() -> Dict:
-    return retrain_food_model()
+def retrain_food_mlops(progress: Optional[Callable[[str, Dict], None]] = None) -> Dict:
+    return retrain_food_model(progress=progress)
 
 
 def list_food_models() -> List[Dict]:
@@ -18,4 +19,8 @@ def list_food_models() -> List[Dict]:
 
 def active_food_model() -> Dict:
     path = get_active_food_model_path()
-    return {"active_food_model": path}
+    return {
+        "active_food_model": path,
+        # set while the first model is trained in the background
+        "training_job_id": None if path else _food_model.training_job_id(),
+    }
@@ -1,6 +1,6 @@
 # app/nutrition/nutrition_models.py
 from datetime import datetime, date
-from sqlalchemy import Column, Integer, Float, String, Date, DateTime, ForeignKey, Text
+from sqlalchemy import Column, Integer, Float, String, Date, DateTime, ForeignKey, Index, JSON
 from sqlalchemy.orm import relationship
 
 from app.database.db import Base
@@ -15,8 +15,8 @@ class MealLog(Base):
     date = Column(Date, default=date.today, index=True)
     meal_type = Column(String, nullable=False)  # "breakfast" (for now)
 
-    # JSON string of items: [{"name": "idli", "quantity": 2}, ...]
-    food_json = Column(Text, nullable=False)
+    # items: [{"name": "idli", "quantity": 2}, ...]
+    food_json = Column(JSON, nullable=False)
 
     calories = Column(Float, nullable=False)
     protein = Column(Float, nullable=False)
@@ -27,6 +27,40 @@ class MealLog(Base):
 
     twin = relationship("Twin")
 
+    # history pages walk this index newest-first (see get_meal_history)
+    __table_args__ = (
+        Index("ix_meal_logs_twin_history", "twin_id", "date", "created_at", "id"),
+    )
+
+
+class MealItemLog(Base):
+    """
+    One food of a logged meal, with its own nutrition: the normalized form
+    of MealLog.food_json for per-food analytics (see meal_analytics.py).
+    twin_id and date are copied from the meal so aggregates need no join.
+    """
+
+    __tablename__ = "meal_items"
+
+    id = Column(Integer, primary_key=True, index=True)
+    meal_id = Column(Integer, ForeignKey("meal_logs.id"), index=True, nullable=False)
+    twin_id = Column(Integer, ForeignKey("twins.id"), nullable=False)
+    date = Column(Date, nullable=False)
+
+    food_id = Column(Integer, ForeignKey("food_catalog.id"), nullable=True)  # NULL: name not recognised or food unpriced
+    name = Column(String, nullable=False)  # as logged
+    quantity = Column(Float, nullable=False)
+
+    calories = Column(Float, nullable=False)
+    protein = Column(Float, nullable=False)
+    carbs = Column(Float, nullable=False)
+    fat = Column(Float, nullable=False)
+
+    __table_args__ = (
+        Index("ix_meal_items_food_date", "food_id", "date"),
+        Index("ix_meal_items_twin_date", "twin_id", "date"),
+    )
+
 
 class DailyCalorieSummary(Base):
     __tablename__ = "daily_calorie_summary"
@@ -40,3 +74,75 @@ class DailyCalorieSummary(Base):
     calorie_balance = Column(Float, default=0.0)  # total - required
 
     twin = relationship("Twin")
+
+    # one row per twin and day; meal logging upserts against it
+    __table_args__ = (
+        Index("ux_daily_calorie_summary_twin_date", "twin_id", "date", unique=True),
+    )
+
+
+class WeeklyNutritionRollup(Base):
+    """
+    Per-twin nutrition totals for one ISO week (period_start is its Monday),
+    kept up to date by meal logging; see app/nutrition/nutrition_rollups.py.
+    """
+
+    __tablename__ = "weekly_nutrition_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    twin_id = Column(Integer, ForeignKey("twins.id"), nullable=False)
+    period_start = Column(Date, nullable=False)
+
+    calories = Column(Float, default=0.0)
+    protein = Column(Float, default=0.0)
+    carbs = Column(Float, default=0.0)
+    fat = Column(Float, default=0.0)
+    meal_count = Column(Integer, default=0)
+    day_count = Column(Integer, default=0)         # days with at least one meal
+    required_calories = Column(Float, default=0.0)  # summed over those days
+
+    __table_args__ = (
+        Index("ux_weekly_nutrition_rollup_twin_period", "twin_id", "period_start", unique=True),
+    )
+
+
+class MonthlyNutritionRollup(Base):
+    """Same as WeeklyNutritionRollup, per calendar month (period_start is the 1st)."""
+
+    __tablename__ = "monthly_nutrition_rollup"
+
+    id = Column(Integer, primary_key=True, index=True)
+    twin_id = Column(Integer, ForeignKey("twins.id"), nullable=False)
+    period_start = Column(Date, nullable=False)
+
+    calories = Column(Float, default=0.0)
+    protein = Column(Float, default=0.0)
+    carbs = Column(Float, default=0.0)
+    fat = Column(Float, default=0.0)
+    meal_count = Column(Integer, default=0)
+    day_count = Column(Integer, default=0)
+    required_calories = Column(Float, default=0.0)
+
+    __table_args__ = (
+        Index("ux_monthly_nutrition_rollup_twin_period", "twin_id", "period_start", unique=True),
+    )
+
+
+class FoodCatalogItem(Base):
+    """One food with its nutrition per "unit" (see app/nutrition/food_catalog.py)."""
+
+    __tablename__ = "food_catalog"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, nullable=False, unique=True, index=True)  # normalized key, e.g. "aloo_paratha"
+    display_name = Column(String, nullable=True)
+    unit = Column(String, nullable=True)
+
+    # per unit; NULL when unknown (then priced by the food ML model)
+    calories = Column(Float, nullable=True)
+    protein = Column(Float, nullable=True)
+    carbs = Column(Float, nullable=True)
+    fat = Column(Float, nullable=True)
+
+    source = Column(String, nullable=True)  # "seed", "upload"...
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
@@ -0,0 +1,247 @@
+# app/nutrition/nutrition_rollups.py
+"""
+Weekly and monthly nutrition rollups per twin, for trend charts.
+
+Each row holds the summed calories / protein / carbs / fat and meal count
+of one twin over one period, plus the number of days with meals and their
+summed required calories, from which the average daily balance follows.
+log_meal and the bulk import add their meals in with an upsert in the
+same transaction as the meal insert, so a year of trends reads at most
+52 weekly or 12 monthly rows. rebuild_rollups recomputes them from the
+raw logs (after schema changes or manual edits):
+
+    python -m app.nutrition.nutrition_rollups rebuild
+"""
+
+import json
+import argparse
+from datetime import date, timedelta
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, insert, select
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from app.database.db import Base, SessionLocal, engine
+from app.database.twin_schema import Twin
+from app.nutrition.nutrition_models import (
+    DailyCalorieSummary,
+    MealLog,
+    MonthlyNutritionRollup,
+    WeeklyNutritionRollup,
+)
+
+NUTRIENTS = ("calories", "protein", "carbs", "fat")
+TOTALS = (*NUTRIENTS, "meal_count", "day_count", "required_calories")
+REBUILD_TWIN_BATCH = 500
+
+
+def week_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _months_back(day: date, months: int) -> date:
+    index = day.year * 12 + day.month - 1 - months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+# period -> (table, start of a Python date, start of a SQL date column, default span)
+PERIODS: Dict[str, Tuple[type, Callable[[date], date], Callable, Callable[[date], date]]] = {
+    "week": (
+        WeeklyNutritionRollup,
+        week_start,
+        lambda col: func.date(col, "weekday 0", "-6 days"),  # Monday of its ISO week
+        lambda end: week_start(end) - timedelta(weeks=51),
+    ),
+    "month": (
+        MonthlyNutritionRollup,
+        month_start,
+        lambda col: func.date(col, "start of month"),
+        lambda end: _months_back(end, 11),
+    ),
+}
+
+
+def _period(period: str):
+    if period not in PERIODS:
+        raise ValueError(f"period must be one of {', '.join(PERIODS)}")
+    return PERIODS[period]
+
+
+# -----------------------------
+#  INCREMENTAL UPDATE
+# -----------------------------
+
+def meal_rollup_entry(twin_id: int, day: date, nutrition: Dict, first_of_day: bool, required: float) -> Dict:
+    """What one meal adds to its periods."""
+    return {
+        "twin_id": twin_id,
+        "date": day,
+        **{n: nutrition[n] for n in NUTRIENTS},
+        "meal_count": 1,
+        "day_count": 1 if first_of_day else 0,
+        "required_calories": required if first_of_day else 0.0,
+    }
+
+
+def update_rollups(db: Session, entries: Iterable[Dict]):
+    """
+    Add meal entries (see meal_rollup_entry) into the weekly and monthly
+    rollups: merged per (twin, period) in Python, then one
+    INSERT ... ON CONFLICT DO UPDATE SET x = x + excluded.x per table.
+    Runs in the caller's transaction; does not commit.
+    """
+    entries = list(entries)
+    if not entries:
+        return
+    for model, start, _, _ in PERIODS.values():
+        merged: Dict[Tuple[int, date], Dict] = {}
+        for e in entries:
+            acc = merged.setdefault((e["twin_id"], start(e["date"])), dict.fromkeys(TOTALS, 0))
+            for k in TOTALS:
+                acc[k] += e[k]
+
+        table = model.__table__
+        stmt = sqlite_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["twin_id", "period_start"],
+            set_={k: table.c[k] + stmt.excluded[k] for k in TOTALS},
+        )
+        db.execute(stmt, [
+            {"twin_id": twin_id, "period_start": period_start, **acc}
+            for (twin_id, period_start), acc in merged.items()
+        ])
+
+
+# -----------------------------
+#  REBUILD FROM RAW LOGS
+# -----------------------------
+
+def _rebuild_twins(db: Session, twin_ids: List[int]):
+    days = (
+        select(
+            MealLog.twin_id,
+            MealLog.date,
+            *(func.sum(getattr(MealLog, n)).label(n) for n in NUTRIENTS),
+            func.count(MealLog.id).label("meal_count"),
+        )
+        .where(MealLog.twin_id.in_(twin_ids))
+        .group_by(MealLog.twin_id, MealLog.date)
+        .subquery()
+    )
+    for model, _, sql_start, _ in PERIODS.values():
+        table = model.__table__
+        period_start = sql_start(days.c.date)
+        db.execute(delete(table).where(table.c.twin_id.in_(twin_ids)))
+        db.execute(
+            insert(table).from_select(
+                ["twin_id", "period_start", *TOTALS],
+                select(
+                    days.c.twin_id,
+                    period_start,
+                    *(func.sum(days.c[n]) for n in NUTRIENTS),
+                    func.sum(days.c.meal_count),
+                    func.count(),
+                    func.sum(func.coalesce(DailyCalorieSummary.required_calories, 0.0)),
+                )
+                .select_from(days.outerjoin(
+                    DailyCalorieSummary,
+                    and_(
+                        DailyCalorieSummary.twin_id == days.c.twin_id,
+                        DailyCalorieSummary.date == days.c.date,
+                    ),
+                ))
+                .group_by(days.c.twin_id, period_start),
+            )
+        )
+
+
+def rebuild_rollups(db: Session, twin_ids: Optional[Iterable[int]] = None, batch_size: int = REBUILD_TWIN_BATCH) -> Dict:
+    """
+    Recompute the rollups of `twin_ids` (default: every twin) from
+    meal_logs and daily_calorie_summary. Twins are rebuilt in batches,
+    one short transaction each, so meal logging is never blocked for long.
+    """
+    if twin_ids is None:
+        twin_ids = db.execute(select(Twin.id).order_by(Twin.id)).scalars().all()
+    twin_ids = sorted(set(twin_ids))
+    for i in range(0, len(twin_ids), batch_size):
+        _rebuild_twins(db, twin_ids[i:i + batch_size])
+        db.commit()
+    return {
+        "twins": len(twin_ids),
+        **{
+            f"{period}_rows": db.scalar(select(func.count()).select_from(model))
+            for period, (model, _, _, _) in PERIODS.items()
+        },
+    }
+
+
+# -----------------------------
+#  RANGE QUERIES
+# -----------------------------
+
+def get_rollups(
+    db: Session,
+    twin_id: int,
+    period: str = "week",
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+) -> List[Dict]:
+    """
+    The twin's rollup rows for the periods overlapping [date_from, date_to],
+    oldest first (default: the last 52 weeks / 12 months). Periods without
+    meals have no row.
+    """
+    model, start, _, default_from = _period(period)
+    date_to = date_to or date.today()
+    date_from = date_from or default_from(date_to)
+
+    rows = db.execute(
+        select(model)
+        .where(
+            model.twin_id == twin_id,
+            model.period_start >= start(date_from),
+            model.period_start <= date_to,
+        )
+        .order_by(model.period_start)
+    ).scalars()
+
+    return [
+        {
+            "period_start": str(r.period_start),
+            **{n: round(getattr(r, n) or 0.0, 3) for n in NUTRIENTS},
+            "meal_count": r.meal_count,
+            "days_logged": r.day_count,
+            "avg_daily_calories": round(r.calories / r.day_count, 3) if r.day_count else None,
+            "avg_balance": round((r.calories - r.required_calories) / r.day_count, 3) if r.day_count else None,
+        }
+        for r in rows
+    ]
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Nutrition rollup maintenance.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    rebuild = sub.add_parser("rebuild", help="recompute weekly / monthly rollups from the meal logs")
+    rebuild.add_argument("--twin", type=int, action="append", dest="twin_ids",
+                         help="twin id to rebuild (repeatable; default: all twins)")
+    args = parser.parse_args(argv)
+
+    Base.metadata.create_all(
+        bind=engine,
+        tables=[WeeklyNutritionRollup.__table__, MonthlyNutritionRollup.__table__],
+    )
+    db = SessionLocal()
+    try:
+        print(json.dumps(rebuild_rollups(db, args.twin_ids), indent=2))
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,18 @@
 # app/nutrition/nutrition_service.py
-from datetime import date
+import base64
+from datetime import date, datetime
 import json
-from typing import List, Dict, Tuple
+from typing import Iterable, List, Dict, Optional, Tuple
 
+from sqlalchemy import delete, func, insert, inspect, select, tuple_, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
 
 from app.database.twin_schema import Twin
-from app.nutrition.nutrition_models import MealLog, DailyCalorieSummary
-from app.nutrition.food_ml_model import predict_meal_nutrition
+from app.utils.cache import TTLCache
+from app.nutrition.nutrition_models import MealLog, MealItemLog, DailyCalorieSummary
+from app.nutrition.nutrition_engine import compute_meal_nutrition
+from app.nutrition.nutrition_rollups import meal_rollup_entry, update_rollups
 
 
 def _estimate_required_calories(twin: Twin) -> float:
@@ -42,23 +47,98 @@ def _estimate_required_calories(twin: Twin) -> float:
     return float(bmr * factor)
 
 
+# (twin_id, twin.updated_at) -> required calories; a profile update changes
+# updated_at, so stale entries are never hit again
+REQUIRED_CALORIES_CACHE_SIZE = 50000
+REQUIRED_CALORIES_CACHE_TTL = 6 * 3600.0
+_required_calories_cache = TTLCache(maxsize=REQUIRED_CALORIES_CACHE_SIZE, ttl=REQUIRED_CALORIES_CACHE_TTL)
+
+
+def required_calories(twin: Twin) -> float:
+    """_estimate_required_calories, memoized per twin version."""
+    key = (twin.id, twin.updated_at)
+    required = _required_calories_cache.get(key)
+    if required is None:
+        required = _estimate_required_calories(twin)
+        _required_calories_cache.set(key, required)
+    return required
+
+
+def required_calories_stats() -> Dict:
+    return _required_calories_cache.stats()
+
+
+def clear_required_calories_cache():
+    _required_calories_cache.clear()
+
+
+def meal_item_rows(meal_id: int, twin_id: int, day: date, resolved_items: List[Dict]) -> List[Dict]:
+    """
+    meal_items rows for one meal, from the engine's per-item report. Insert
+    them into MealItemLog.__table__: the ORM bulk path starts a new
+    statement whenever food_id flips between NULL and a value. Unpriced
+    foods are stored like unknown names (no food_id, zero nutrition), so
+    per-food analytics only ever sum real values.
+    """
+    return [
+        {
+            "meal_id": meal_id,
+            "twin_id": twin_id,
+            "date": day,
+            "food_id": item["food_id"] if item["match"] != "unpriced" else None,
+            "name": item["name"],
+            "quantity": item["quantity"],
+            "calories": item["calories"],
+            "protein": item["protein"],
+            "carbs": item["carbs"],
+            "fat": item["fat"],
+        }
+        for item in resolved_items
+    ]
+
+
+def _summary_upsert(rows: List[Dict], accumulate: bool):
+    """
+    INSERT ... ON CONFLICT (twin_id, date) DO UPDATE for daily summaries.
+    With `accumulate` the new total is added to the stored one (meal
+    logging); otherwise it replaces it (recomputation). calorie_balance
+    is derived from the stored required_calories in the same statement,
+    so concurrent writers never lose an increment.
+    """
+    stmt = sqlite_insert(DailyCalorieSummary).values(rows)
+    total = stmt.excluded.total_calories
+    if accumulate:
+        total = DailyCalorieSummary.total_calories + total
+    return stmt.on_conflict_do_update(
+        index_elements=["twin_id", "date"],
+        set_={
+            "total_calories": total,
+            "calorie_balance": total - func.coalesce(DailyCalorieSummary.required_calories, 0.0),
+        },
+    )
+
+
 def log_meal(
     db: Session,
     twin_id: int,
     meal_type: str,
     items: List[Dict[str, float]],
-) -> Tuple[MealLog, DailyCalorieSummary]:
+) -> Tuple[MealLog, DailyCalorieSummary, List[Dict]]:
     """
     Core function:
-    - uses ML to predict meal nutrition
-    - logs MealLog
-    - updates DailyCalorieSummary
+    - computes meal nutrition (exact per-unit values, fuzzy name matching)
+    - logs MealLog and its meal_items rows
+    - upserts DailyCalorieSummary and the weekly / monthly rollups
+      in the same transaction
+    Also returns how each item name was resolved.
     """
     twin = db.query(Twin).filter(Twin.id == twin_id).first()
     if not twin:
         raise ValueError("Twin not found")
 
-    nutrition = predict_meal_nutrition(items)
+    # everything slow happens before the write transaction starts
+    nutrition = compute_meal_nutrition(items)
+    required = required_calories(twin)
 
     today = date.today()
 
@@ -66,45 +146,136 @@ def log_meal(
         twin_id=twin_id,
         date=today,
         meal_type=meal_type,
-        food_json=json.dumps(items),
+        food_json=items,
         calories=nutrition["calories"],
         protein=nutrition["protein"],
         carbs=nutrition["carbs"],
         fat=nutrition["fat"],
     )
     db.add(meal)
+    db.flush()
+    rows = meal_item_rows(meal.id, twin_id, today, nutrition["items"])
+    if rows:  # an empty parameter list would run one parameterless INSERT
+        db.execute(insert(MealItemLog.__table__), rows)
 
-    daily = (
-        db.query(DailyCalorieSummary)
-        .filter(
-            DailyCalorieSummary.twin_id == twin_id,
-            DailyCalorieSummary.date == today,
-        )
-        .first()
+    upsert = _summary_upsert(
+        [{
+            "twin_id": twin_id,
+            "date": today,
+            "total_calories": nutrition["calories"],
+            "required_calories": required,
+            "calorie_balance": nutrition["calories"] - required,
+        }],
+        accumulate=True,
     )
+    daily = db.scalars(
+        upsert.returning(DailyCalorieSummary),
+        execution_options={"populate_existing": True},
+    ).one()
 
-    if not daily:
-        required = _estimate_required_calories(twin)
-        daily = DailyCalorieSummary(
-            twin_id=twin_id,
-            date=today,
-            total_calories=nutrition["calories"],
-            required_calories=required,
-        )
-        daily.calorie_balance = daily.total_calories - daily.required_calories
-        db.add(daily)
-    else:
-        daily.total_calories += nutrition["calories"]
-        daily.calorie_balance = daily.total_calories - daily.required_calories
+    # we hold SQLite's write lock since the meal insert, so this count is exact
+    first_of_day = db.scalar(
+        select(func.count())
+        .select_from(MealLog)
+        .where(MealLog.twin_id == twin_id, MealLog.date == today)
+    ) == 1
+    update_rollups(db, [
+        meal_rollup_entry(twin_id, today, nutrition, first_of_day, daily.required_calories or 0.0)
+    ])
 
     db.commit()
-    db.refresh(meal)
-    db.refresh(daily)
 
-    return meal, daily
+    return meal, daily, nutrition["items"]
+
+
+SUMMARY_CHUNK_SIZE = 500
+
+
+def recompute_daily_summaries(db: Session, keys: Iterable[Tuple[int, date]]) -> int:
+    """
+    Set the DailyCalorieSummary of every (twin_id, date) in `keys` to the
+    sum of its logged meals, creating missing rows. Used after bulk
+    imports: one grouped query and one upsert per chunk of keys instead
+    of one round trip per meal.
+    """
+    keys = sorted(set(keys))
+    for i in range(0, len(keys), SUMMARY_CHUNK_SIZE):
+        part = keys[i:i + SUMMARY_CHUNK_SIZE]
+
+        totals = dict(
+            ((twin_id, day), total)
+            for twin_id, day, total in db.query(
+                MealLog.twin_id, MealLog.date, func.sum(MealLog.calories)
+            )
+            .filter(tuple_(MealLog.twin_id, MealLog.date).in_(part))
+            .group_by(MealLog.twin_id, MealLog.date)
+        )
+        # only used for rows that do not exist yet
+        required = {
+            t.id: required_calories(t)
+            for t in db.query(Twin).filter(Twin.id.in_({twin_id for twin_id, _ in part}))
+        }
+
+        rows = []
+        for twin_id, day in part:
+            total = float(totals.get((twin_id, day)) or 0.0)
+            req = required.get(twin_id, 2000.0)
+            rows.append({
+                "twin_id": twin_id,
+                "date": day,
+                "total_calories": total,
+                "required_calories": req,
+                "calorie_balance": total - req,
+            })
+        db.execute(_summary_upsert(rows, accumulate=False))
+        db.commit()
+
+    return len(keys)
+
+
+def merge_duplicate_daily_summaries(conn) -> int:
+    """
+    Collapse duplicate (twin_id, date) summaries, left behind by concurrent
+    writers before the unique index existed, into the oldest row with the
+    day's total re-summed from meal_logs. Must run before the index is
+    created on an existing database. Returns the number of rows removed.
+    """
+    table = DailyCalorieSummary.__table__
+    if not inspect(conn).has_table(table.name):
+        return 0
+
+    dupes = conn.execute(
+        select(table.c.twin_id, table.c.date, func.min(table.c.id))
+        .group_by(table.c.twin_id, table.c.date)
+        .having(func.count() > 1)
+    ).all()
+
+    removed = 0
+    for twin_id, day, keep_id in dupes:
+        same_day = (table.c.twin_id == twin_id) & (table.c.date == day)
+        removed += conn.execute(delete(table).where(same_day, table.c.id != keep_id)).rowcount
+        total = conn.execute(
+            select(func.coalesce(func.sum(MealLog.calories), 0.0))
+            .where(MealLog.twin_id == twin_id, MealLog.date == day)
+        ).scalar()
+        conn.execute(
+            update(table)
+            .where(table.c.id == keep_id)
+            .values(
+                total_calories=total,
+                calorie_balance=total - func.coalesce(table.c.required_calories, 0.0),
+            )
+        )
+    return removed
 
 
 def get_daily_summary(db: Session, twin_id: int) -> DailyCalorieSummary:
+    """
+    Today's summary. Read-only: before the first meal of the day it returns
+    an unsaved zero-consumption summary instead of inserting one, so
+    dashboard polls never take SQLite's write lock. The row itself is
+    created by log_meal.
+    """
     today = date.today()
     daily = (
         db.query(DailyCalorieSummary)
@@ -118,29 +289,99 @@ def get_daily_summary(db: Session, twin_id: int) -> DailyCalorieSummary:
     if daily:
         return daily
 
-    # If no record yet, compute baseline with 0 consumed
-    twin = db.query(Twin).filter(Twin.id == twin_id).first()
-    if not twin:
+    # only the row version is needed to answer from cache
+    row = db.query(Twin.id, Twin.updated_at).filter(Twin.id == twin_id).first()
+    if not row:
         raise ValueError("Twin not found")
 
-    required = _estimate_required_calories(twin)
-    daily = DailyCalorieSummary(
+    key = (row.id, row.updated_at)
+    required = _required_calories_cache.get(key)
+    if required is None:
+        required = _estimate_required_calories(db.query(Twin).filter(Twin.id == twin_id).one())
+        _required_calories_cache.set(key, required)
+
+    return DailyCalorieSummary(
         twin_id=twin_id,
         date=today,
         total_calories=0.0,
         required_calories=required,
         calorie_balance=-required,
     )
-    db.add(daily)
-    db.commit()
-    db.refresh(daily)
-    return daily
 
 
-def get_meal_history(db: Session, twin_id: int) -> List[MealLog]:
-    return (
-        db.query(MealLog)
-        .filter(MealLog.twin_id == twin_id)
-        .order_by(MealLog.date.desc(), MealLog.created_at.desc())
-        .all()
-    )
+HISTORY_PAGE_SIZE = 50
+HISTORY_MAX_PAGE_SIZE = 200
+
+
+def _encode_cursor(day: date, created_at: Optional[datetime], meal_id: int) -> str:
+    raw = json.dumps([day.isoformat(), created_at.isoformat() if created_at else None, meal_id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor: str) -> Tuple[date, Optional[datetime], int]:
+    try:
+        day, created_at, meal_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return (
+            date.fromisoformat(day),
+            datetime.fromisoformat(created_at) if created_at else None,
+            int(meal_id),
+        )
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid history cursor") from e
+
+
+def get_meal_history(
+    db: Session,
+    twin_id: int,
+    limit: int = HISTORY_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    date_from: Optional[date] = None,
+    date_to: Optional[date] = None,
+    include_items: bool = True,
+) -> Tuple[List[Dict], Optional[str]]:
+    """
+    One page of a twin's meals, newest first, ordered by (date, created_at, id).
+    Pages continue strictly after `cursor` (the previous page's next_cursor),
+    so every page is one range scan of ix_meal_logs_twin_history however long
+    the history is. Without `include_items` the item lists are not read.
+    Returns (meals, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    columns = [
+        MealLog.id, MealLog.twin_id, MealLog.date, MealLog.created_at, MealLog.meal_type,
+        MealLog.calories, MealLog.protein, MealLog.carbs, MealLog.fat,
+    ]
+    if include_items:
+        columns.append(MealLog.food_json.label("items"))
+
+    stmt = select(*columns).where(MealLog.twin_id == twin_id)
+    if date_from is not None:
+        stmt = stmt.where(MealLog.date >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(MealLog.date <= date_to)
+    if cursor:
+        day, created_at, meal_id = _decode_cursor(cursor)
+        # the plain bound keeps this an index range scan despite the ORs below
+        stmt = stmt.where(MealLog.date <= day)
+        if created_at is None:
+            # legacy rows without created_at sort last within their day
+            stmt = stmt.where(
+                (MealLog.date < day)
+                | ((MealLog.date == day) & MealLog.created_at.is_(None) & (MealLog.id < meal_id))
+            )
+        else:
+            stmt = stmt.where(
+                (tuple_(MealLog.date, MealLog.created_at, MealLog.id) < tuple_(day, created_at, meal_id))
+                | ((MealLog.date == day) & MealLog.created_at.is_(None))
+            )
+    stmt = stmt.order_by(
+        MealLog.date.desc(), MealLog.created_at.desc(), MealLog.id.desc()
+    ).limit(limit + 1)
+
+    rows = db.execute(stmt).mappings().all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = _encode_cursor(last["date"], last["created_at"], last["id"])
+    return [dict(r) for r in rows], next_cursor
@@ -0,0 +1,88 @@
+# scripts/bench_model_loading.py
+"""
+Load the active alert model in N concurrent worker processes, the way
+`uvicorn --workers N` would, and report load time and memory per mode:
+
+- pipeline:      joblib.load of the sklearn pipeline (previous behaviour)
+- compiled:      compiled arrays read into private memory
+- compiled-mmap: compiled arrays memory-mapped (what workers now use)
+
+PSS splits shared pages between the processes mapping them, so the summed
+PSS is the real footprint of all workers together.
+
+    python -m scripts.bench_model_loading --workers 8
+"""
+
+import time
+import argparse
+import multiprocessing
+
+import numpy as np
+from joblib import load
+
+from app.ml.compiled_model import CompiledModel
+from app.ml.model_manager import N_FEATURES, get_active_model_info, process_memory
+
+MODES = ("pipeline", "compiled", "compiled-mmap")
+
+
+def _worker(mode, info, barrier, results):
+    base = process_memory()
+    started = time.perf_counter()
+    if mode == "pipeline":
+        model = load(info["path"])
+    else:
+        model = CompiledModel.load(info["compiled_path"], mmap=(mode == "compiled-mmap"))
+    load_seconds = time.perf_counter() - started
+
+    # touch every node, as real traffic eventually does
+    model.predict(np.random.default_rng(0).normal(size=(2000, N_FEATURES)))
+
+    # measure while every worker holds its model
+    barrier.wait()
+    memory = process_memory()
+    results.put({
+        "load_seconds": load_seconds,
+        "rss": memory.get("rss_bytes", 0) - base.get("rss_bytes", 0),
+        "pss": memory.get("pss_bytes", 0) - base.get("pss_bytes", 0),
+    })
+    barrier.wait()
+
+
+def run(mode, info, workers):
+    ctx = multiprocessing.get_context("spawn")
+    barrier = ctx.Barrier(workers)
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(mode, info, barrier, results)) for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    mib = 1024 * 1024
+    return {
+        "mode": mode,
+        "load_ms_mean": round(1000 * float(np.mean([r["load_seconds"] for r in rows])), 2),
+        "rss_mib_total": round(sum(r["rss"] for r in rows) / mib, 1),
+        "pss_mib_total": round(sum(r["pss"] for r in rows) / mib, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+
+    info = get_active_model_info()
+    if not info:
+        raise SystemExit("No active alert model; run /api/mlops/retrain first.")
+
+    modes = MODES if info.get("compiled_path") else MODES[:1]
+    print(f"model: {info['path']} ({info.get('model_type')}), workers: {args.workers}")
+    for mode in modes:
+        print(run(mode, info, args.workers))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+from datetime import date
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+import app.database.migrate  # noqa: F401  (registers every table)
+from app.database.db import Base
+from app.database.twin_schema import Twin
+from app.nutrition import food_catalog
+from app.nutrition.nutrition_models import DailyCalorieSummary, MealItemLog, MealLog
+from app.nutrition.nutrition_service import log_meal
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A session on a fresh database file; the food catalog reads it too."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'test.db'}")
+    Base.metadata.create_all(bind=engine)
+    monkeypatch.setattr(food_catalog, "engine", engine)
+    monkeypatch.setattr(food_catalog, "_snapshot", None)
+    monkeypatch.setattr(food_catalog, "_ready", False)
+    monkeypatch.setattr(food_catalog, "_checked_at", 0.0)
+
+    session = sessionmaker(bind=engine)()
+    session.add(Twin(id=1, user_id=1, name="test", age=30, gender="male", height_cm=175.0, weight_kg=70.0))
+    session.commit()
+    yield session
+    session.close()
+    engine.dispose()
+
+
+def _count(db, model):
+    return db.scalar(select(func.count()).select_from(model))
+
+
+def test_log_meal_without_items(db):
+    meal, daily, items = log_meal(db, 1, "breakfast", [])
+
+    assert items == []
+    assert meal.calories == 0.0
+    assert daily.date == date.today()
+    assert daily.total_calories == 0.0
+    assert _count(db, MealLog) == 1
+    assert _count(db, MealItemLog) == 0
+
+
+def test_log_meal_writes_one_item_row_per_item(db):
+    meal, daily, items = log_meal(db, 1, "breakfast", [
+        {"name": "idli", "quantity": 2},
+        {"name": "no such food", "quantity": 1},
+    ])
+
+    assert [i["match"] for i in items] == ["exact", "unknown"]
+    assert meal.calories == pytest.approx(items[0]["calories"])
+    assert daily.total_calories == pytest.approx(meal.calories)
+    assert _count(db, MealItemLog) == 2